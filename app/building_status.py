@@ -0,0 +1,130 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, func, insert, literal
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import BuildingStatus
+from app.scoring import SEVERITY_WEIGHTS, severity_weight_expr, status_case
+
+
+# =====================================================
+# ИНКРЕМЕНТАЛЬНЫЕ ОБНОВЛЕНИЯ (в транзакции вызывающего, без commit)
+# =====================================================
+
+def _ensure_row(db: Session, building_id: int):
+    if db.get(BuildingStatus, building_id) is None:
+        db.add(BuildingStatus(building_id=building_id))
+        db.flush()
+
+
+def _bump(db: Session, building_id: int, score_delta: int = 0, help_delta: int = 0, at=None):
+    at = at or datetime.utcnow()
+    _ensure_row(db, building_id)
+
+    values = {
+        BuildingStatus.last_activity_at: at,
+        BuildingStatus.updated_at: at,
+    }
+
+    if score_delta:
+        new_score = BuildingStatus.score + score_delta
+        values[BuildingStatus.score] = new_score
+        values[BuildingStatus.status] = status_case(new_score)
+
+    if help_delta:
+        values[BuildingStatus.help_count] = BuildingStatus.help_count + help_delta
+
+    db.query(BuildingStatus).filter(
+        BuildingStatus.building_id == building_id
+    ).update(values, synchronize_session=False)
+
+
+def init_building(db: Session, building_id: int):
+    _ensure_row(db, building_id)
+
+
+def apply_report_created(db: Session, building_id: int, severity: str):
+    _bump(db, building_id, score_delta=SEVERITY_WEIGHTS.get(severity, 0))
+
+
+def apply_severity_change(db: Session, building_id: int, old: str, new: str):
+    delta = SEVERITY_WEIGHTS.get(new, 0) - SEVERITY_WEIGHTS.get(old, 0)
+    _bump(db, building_id, score_delta=delta)
+
+
+def apply_help_delta(db: Session, building_id: int, delta: int):
+    _bump(db, building_id, help_delta=delta)
+
+
+def mark_changed(db: Session, building_id: int):
+    # Данные дома на карте изменились (позиция, «норма») — только для ETag/Last-Modified
+    _ensure_row(db, building_id)
+    db.query(BuildingStatus).filter(
+        BuildingStatus.building_id == building_id
+    ).update({BuildingStatus.updated_at: datetime.utcnow()}, synchronize_session=False)
+
+
+def touch(db: Session, building_id: int):
+    # Подтверждения, решение, устаревание — оценку не меняют, но это активность
+    _bump(db, building_id)
+
+
+# =====================================================
+# ПОЛНЫЙ ПЕРЕСЧЁТ (бэкфилл)
+# =====================================================
+
+def aggregate_query(db: Session):
+    scores = (
+        db.query(
+            models.Report.building_id.label("building_id"),
+            func.sum(severity_weight_expr).label("score"),
+            func.max(models.Report.created_at).label("last_report_at"),
+        )
+        .group_by(models.Report.building_id)
+        .subquery()
+    )
+
+    helps = (
+        db.query(
+            models.NeighborHelp.building_id.label("building_id"),
+            func.count(models.NeighborHelp.id).label("help_count"),
+        )
+        .filter(models.NeighborHelp.status == "open")
+        .group_by(models.NeighborHelp.building_id)
+        .subquery()
+    )
+
+    return (
+        db.query(
+            models.Building.id.label("building_id"),
+            func.coalesce(scores.c.score, 0).label("score"),
+            func.coalesce(helps.c.help_count, 0).label("help_count"),
+            scores.c.last_report_at.label("last_activity_at"),
+        )
+        .outerjoin(scores, scores.c.building_id == models.Building.id)
+        .outerjoin(helps, helps.c.building_id == models.Building.id)
+    )
+
+
+def rebuild(db: Session) -> int:
+    now = datetime.utcnow()
+    agg = aggregate_query(db).subquery()
+
+    db.query(BuildingStatus).delete(synchronize_session=False)
+    db.execute(
+        insert(BuildingStatus).from_select(
+            ["building_id", "score", "status", "help_count", "last_activity_at", "updated_at"],
+            db.query(
+                agg.c.building_id,
+                agg.c.score,
+                status_case(agg.c.score),
+                agg.c.help_count,
+                agg.c.last_activity_at,
+                literal(now, DateTime()),
+            ),
+        )
+    )
+    db.commit()
+
+    return db.query(BuildingStatus).count()
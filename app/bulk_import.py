@@ -0,0 +1,306 @@
+"""Bulk-импорт домов и исторических жалоб из CSV / NDJSON / GeoJSON.
+
+Файл читается потоком, записи валидируются теми же схемами, что и API
+(BuildingCreate / ReportCreate), и вставляются пачками executemany —
+одна транзакция на пачку. Чекпоинт (сколько записей файла уже вставлено)
+пишется в import_progress в той же транзакции, поэтому после падения
+повторный запуск продолжает ровно с места остановки.
+"""
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app import building_status, crud, models, rollups, schemas
+from app.config import IMPORT_BATCH_SIZE
+from app.database import dialect_insert
+from app.geo import quadkey_for
+
+FORMATS = ("csv", "ndjson", "geojsonseq", "geojson")
+
+REPORT_STATUSES = ("open", "resolved", "outdated")
+
+# Сколько отклонённых записей показывать подробно, дальше — только счётчик
+MAX_SHOWN_ERRORS = 20
+
+
+# =====================================================
+# ЧТЕНИЕ: генераторы dict-ов, память не зависит от размера файла
+# =====================================================
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".csv":
+        return "csv"
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if ext in (".geojsonl", ".geojsons", ".geojsonseq"):
+        return "geojsonseq"
+    if ext in (".geojson", ".json"):
+        return "geojson"
+
+    raise ValueError(f"Не понятен формат файла {path}, укажите --format")
+
+
+def _read_csv(f):
+    for row in csv.DictReader(f):
+        # Пустая ячейка = поля нет
+        yield {k: v for k, v in row.items() if v not in ("", None)}
+
+
+def _read_lines(f):
+    # Отдаём сырую строку: разбор — в _flatten, под try записи, чтобы битая
+    # строка отклонялась и считалась, а не роняла весь импорт
+    for line in f:
+        line = line.strip().lstrip("\x1e")  # GeoJSONSeq (RFC 8142) начинает запись с RS
+        if line:
+            yield line
+
+
+def _read_feature_collection(f):
+    try:
+        import ijson
+    except ImportError:
+        # Без ijson весь FeatureCollection читается в память — для больших городов
+        # ставьте ijson или конвертируйте в GeoJSONSeq / NDJSON
+        print("ijson не установлен, GeoJSON читается целиком", file=sys.stderr)
+        yield from json.load(f).get("features", [])
+        return
+
+    yield from ijson.items(f, "features.item")
+
+
+def _point(geometry):
+    # Point — как есть; полигон контура дома — среднее вершин внешнего кольца
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates")
+
+    if kind == "Point":
+        return coords[0], coords[1]
+    if kind == "MultiPolygon":
+        coords = coords[0]
+    elif kind != "Polygon":
+        raise ValueError(f"геометрия {kind} не поддерживается")
+
+    ring = coords[0]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+
+    return (
+        sum(float(p[0]) for p in ring) / len(ring),
+        sum(float(p[1]) for p in ring) / len(ring),
+    )
+
+
+def _flatten(record):
+    # GeoJSON Feature → плоский dict: properties + lat/lng из геометрии
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("запись не JSON-объект")
+
+    if record.get("type") != "Feature":
+        return record
+
+    flat = dict(record.get("properties") or {})
+    if record.get("geometry"):
+        lng, lat = _point(record["geometry"])
+        flat.setdefault("lat", float(lat))
+        flat.setdefault("lng", float(lng))
+
+    return flat
+
+
+def read_records(f, fmt: str):
+    if fmt == "csv":
+        return _read_csv(f)
+    if fmt in ("ndjson", "geojsonseq"):
+        return _read_lines(f)
+    if fmt == "geojson":
+        return _read_feature_collection(f)
+
+    raise ValueError(f"Неизвестный формат {fmt}")
+
+
+# =====================================================
+# ВАЛИДАЦИЯ: запись → values для INSERT (или исключение)
+# =====================================================
+
+def building_values(raw):
+    data = schemas.BuildingCreate.model_validate(_flatten(raw))
+
+    return {
+        "lat": data.lat,
+        "lng": data.lng,
+        "address": data.address or "",
+        "quadkey": quadkey_for(data.lat, data.lng),
+    }
+
+
+def report_values(raw):
+    raw = _flatten(raw)
+    data = schemas.ReportCreate.model_validate(raw)
+
+    status = raw.get("status") or "open"
+    if status not in REPORT_STATUSES:
+        raise ValueError(f"status: {status}")
+
+    created_at = raw.get("created_at")
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        if created_at.tzinfo:
+            # В базе наивное UTC, как у datetime.utcnow
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return {
+        "building_id": data.building_id,
+        "category": data.category.value,
+        "severity": data.severity.value,
+        "periodicity": data.periodicity.value,
+        "text": data.text,
+        "user_hash": raw.get("user_hash") or "import",
+        "status": status,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+# =====================================================
+# ВСТАВКА ПАЧЕК (в транзакции вызывающего, без commit)
+# =====================================================
+
+def insert_buildings(db: Session, rows) -> int:
+    ids = db.scalars(insert(models.Building).returning(models.Building.id), rows).all()
+
+    # Строка проекции статуса, как в init_building — новый дом сразу «зелёный»
+    db.execute(insert(models.BuildingStatus), [{"building_id": i} for i in ids])
+
+    return len(ids)
+
+
+def insert_reports(db: Session, rows) -> int:
+    wanted = {r["building_id"] for r in rows}
+    known = set(db.scalars(select(models.Building.id).where(models.Building.id.in_(wanted))))
+
+    rows = [r for r in rows if r["building_id"] in known]
+    if rows:
+        db.execute(insert(models.Report), rows)
+
+    return len(rows)
+
+
+def finish_reports(db: Session):
+    # Проекции по жалобам пересчитываем один раз в конце, set-based —
+    # это быстрее, чем инкрементально на каждую из миллионов строк
+    building_status.rebuild(db)
+    rollups.rebuild(db)
+    crud.backfill_report_counts(db)
+
+
+KINDS = {
+    "buildings": (building_values, insert_buildings, None),
+    "reports": (report_values, insert_reports, finish_reports),
+}
+
+
+# =====================================================
+# ЧЕКПОИНТ
+# =====================================================
+
+def _source(kind: str, path: str) -> str:
+    return f"{kind}:{os.path.abspath(path)}"
+
+
+def load_progress(db: Session, source: str):
+    return db.get(models.ImportProgress, source)
+
+
+def _save_progress(db: Session, source: str, records: int, inserted: int, rejected: int):
+    P = models.ImportProgress
+    stmt = dialect_insert(db, P).values(
+        source=source,
+        records=records,
+        inserted=inserted,
+        rejected=rejected,
+        updated_at=datetime.utcnow(),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source"],
+        set_={
+            "records": stmt.excluded.records,
+            "inserted": stmt.excluded.inserted,
+            "rejected": stmt.excluded.rejected,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+# =====================================================
+# ИМПОРТ
+# =====================================================
+
+def run_import(
+    db: Session,
+    kind: str,
+    path: str,
+    fmt: str = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    restart: bool = False,
+    log=sys.stderr,
+) -> dict:
+    to_values, insert_batch, finish = KINDS[kind]
+    fmt = fmt or detect_format(path)
+    source = _source(kind, path)
+
+    records = inserted = rejected = 0
+    progress = None if restart else load_progress(db, source)
+    if progress:
+        records, inserted, rejected = progress.records, progress.inserted, progress.rejected
+        print(f"{kind}: продолжаем с записи {records}", file=log)
+
+    started = time.monotonic()
+    done_before = records
+
+    with open(path, newline="", encoding="utf-8") as f:
+        stream = itertools.islice(read_records(f, fmt), records, None)
+
+        while True:
+            chunk = list(itertools.islice(stream, batch_size))
+            if not chunk:
+                break
+
+            rows = []
+            for offset, raw in enumerate(chunk, start=records + 1):
+                try:
+                    rows.append(to_values(raw))
+                except (ValidationError, ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                    rejected += 1
+                    if rejected <= MAX_SHOWN_ERRORS:
+                        print(f"{kind}: запись {offset} отклонена: {e}", file=log)
+
+            added = insert_batch(db, rows) if rows else 0
+            rejected += len(rows) - added  # например, жалоба на несуществующий дом
+            inserted += added
+            records += len(chunk)
+
+            _save_progress(db, source, records, inserted, rejected)
+            db.commit()
+
+            rate = (records - done_before) / max(time.monotonic() - started, 1e-9)
+            print(
+                f"{kind}: {records} записей, вставлено {inserted}, отклонено {rejected} ({rate:.0f}/с)",
+                file=log,
+            )
+
+    if finish:
+        finish(db)
+
+    return {"records": records, "inserted": inserted, "rejected": rejected}
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import CACHE_BACKEND, REDIS_URL
+
+
+class MemoryCache:
+    # LRU + TTL в памяти процесса
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: int):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class RedisCache:
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        raw = self.client.get(f"cache:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl: int):
+        self.client.setex(f"cache:{key}", ttl, json.dumps(value))
+
+    def version(self, namespace: str) -> int:
+        return int(self.client.get(f"cache-version:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(f"cache-version:{namespace}")
+
+
+def _create_cache():
+    if CACHE_BACKEND == "redis":
+        import redis
+
+        return RedisCache(redis.Redis.from_url(REDIS_URL))
+
+    return MemoryCache()
+
+
+cache = _create_cache()
+
+# Версия данных аналитики: поднимается при записи жалоб и смене их статуса
+ANALYTICS = "analytics"
+
+
+def bump_analytics():
+    cache.bump(ANALYTICS)
+
+
+def cached_json(request: Request, namespace: str, key: str, compute, ttl: int) -> Response:
+    # Ключ включает версию — после записи старые ответы просто перестают находиться
+    full_key = f"{namespace}:v{cache.version(namespace)}:{key}"
+
+    hit = cache.get(full_key)
+    if hit is None:
+        body = json.dumps(jsonable_encoder(compute()), ensure_ascii=False)
+        etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+        hit = [etag, body]
+        cache.set(full_key, hit, ttl)
+
+    etag, body = hit
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# =====================================================
+# УСЛОВНЫЙ GET: ETag / Last-Modified по версии данных
+# =====================================================
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Слабое сравнение: W/"x" и "x" совпадают
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def conditional(request: Request, last_changed, *parts):
+    """(304-ответ или None, заголовки) по версии данных.
+
+    last_changed — когда данные ответа последний раз менялись (building_status.updated_at),
+    parts — всё остальное, от чего зависит ответ (например, число домов в bbox).
+    Параметры запроса и Accept входят в ETag сами. Без версии (нет строки проекции) — без ETag.
+    """
+    if last_changed is None:
+        return None, {}
+
+    key = repr((last_changed, parts, str(request.url.query), request.headers.get("accept", "")))
+    headers = {
+        "ETag": 'W/"' + hashlib.md5(key.encode()).hexdigest() + '"',
+        "Cache-Control": "no-cache",
+    }
+
+    modified = last_changed.replace(microsecond=0, tzinfo=timezone.utc)
+    headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        fresh = False
+        since = request.headers.get("if-modified-since")
+        if since:
+            try:
+                fresh = modified <= parsedate_to_datetime(since)
+            except (TypeError, ValueError):
+                fresh = False
+
+    if fresh:
+        return Response(status_code=304, headers=headers), headers
+
+    return None, headers
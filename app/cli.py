@@ -0,0 +1,149 @@
+"""Служебные команды.
+
+После обновления старой базы — сначала `migrate` (новые колонки с заполнением,
+индексы, пустые проекции), при необходимости `ensure-unique` (удаляет дубли!).
+Остальные команды без `migrate` не запускаются.
+
+    python -m app.cli migrate
+    python -m app.cli rebuild-status
+    python -m app.cli rebuild-rollups
+    python -m app.cli rebuild-report-counts
+    python -m app.cli rebuild-confirmation-counts
+    python -m app.cli ensure-unique
+    python -m app.cli rebuild-quadkeys
+    python -m app.cli sweep
+    python -m app.cli image-variants
+    python -m app.cli import buildings city.geojson
+    python -m app.cli import reports history.csv [--restart]
+"""
+import argparse
+
+from app import building_status, bulk_import, crud, images, rollups
+from app.config import IMPORT_BATCH_SIZE
+from app.database import Base, SessionLocal, engine
+from app.sweeper import sweep_once
+
+
+def migrate(args):
+    with SessionLocal() as db:
+        done = crud.migrate_schema(db)
+
+    for item in done:
+        print(f"schema: {item}")
+    print("schema: up to date")
+
+
+def rebuild_status(args):
+    with SessionLocal() as db:
+        count = building_status.rebuild(db)
+    print(f"building_status: {count} rows")
+
+
+def rebuild_rollups(args):
+    with SessionLocal() as db:
+        count = rollups.rebuild(db)
+    print(f"report_daily_rollups: {count} rows")
+
+
+def rebuild_report_counts(args):
+    with SessionLocal() as db:
+        count = crud.backfill_report_counts(db)
+    print(f"report_count: {count} buildings")
+
+
+def rebuild_confirmation_counts(args):
+    with SessionLocal() as db:
+        count = crud.backfill_confirmation_counts(db)
+    print(f"problem_count / resolved_count: {count} reports")
+
+
+def ensure_unique(args):
+    with SessionLocal() as db:
+        removed = crud.ensure_unique_indexes(db)
+        print(f"removed duplicates: {removed}")
+
+        if removed["report_confirmations"]:
+            crud.backfill_confirmation_counts(db)
+
+
+def rebuild_quadkeys(args):
+    with SessionLocal() as db:
+        count = crud.backfill_quadkeys(db)
+    print(f"quadkeys: {count} buildings")
+
+
+def sweep(args):
+    print(f"outdated: {sweep_once()} reports")
+
+
+def image_variants(args):
+    print(f"image variants: {images.backfill_variants()} originals")
+
+
+def import_file(args):
+    with SessionLocal() as db:
+        result = bulk_import.run_import(
+            db,
+            args.kind,
+            args.path,
+            fmt=args.format,
+            batch_size=args.batch_size,
+            restart=args.restart,
+        )
+    print(f"{args.kind}: {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="добавить новые колонки и индексы в существующую базу")
+    p.set_defaults(func=migrate)
+
+    p = sub.add_parser("rebuild-status", help="пересчитать проекцию статусов домов")
+    p.set_defaults(func=rebuild_status)
+
+    p = sub.add_parser("rebuild-rollups", help="пересчитать дневные агрегаты жалоб для аналитики")
+    p.set_defaults(func=rebuild_rollups)
+
+    p = sub.add_parser("rebuild-report-counts", help="пересчитать счётчики жалоб домов (топ домов)")
+    p.set_defaults(func=rebuild_report_counts)
+
+    p = sub.add_parser("rebuild-confirmation-counts", help="пересчитать счётчики подтверждений жалоб")
+    p.set_defaults(func=rebuild_confirmation_counts)
+
+    p = sub.add_parser("ensure-unique", help="убрать дубли подтверждений/откликов и создать уникальные индексы")
+    p.set_defaults(func=ensure_unique)
+
+    p = sub.add_parser("rebuild-quadkeys", help="проставить квадключи домам (для /buildings/tiles)")
+    p.set_defaults(func=rebuild_quadkeys)
+
+    p = sub.add_parser("sweep", help="пометить устаревшие жалобы как outdated")
+    p.set_defaults(func=sweep)
+
+    p = sub.add_parser("image-variants", help="сгенерировать превью для уже загруженных картинок")
+    p.set_defaults(func=image_variants)
+
+    p = sub.add_parser("import", help="bulk-загрузка домов или жалоб из CSV / NDJSON / GeoJSON")
+    p.add_argument("kind", choices=sorted(bulk_import.KINDS))
+    p.add_argument("path")
+    p.add_argument("--format", choices=bulk_import.FORMATS, help="по умолчанию — по расширению файла")
+    p.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    p.add_argument("--restart", action="store_true", help="игнорировать чекпоинт и начать файл заново")
+    p.set_defaults(func=import_file)
+
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    if args.func is not migrate:
+        with SessionLocal() as db:
+            pending = crud.pending_migrations(db)
+        if pending:
+            parser.exit(1, f"схема устарела ({', '.join(pending)}): сначала python -m app.cli migrate\n")
+
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
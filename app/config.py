@@ -4,3 +4,84 @@ import os
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Сколько секунд CDN/браузер может держать тайл карты
+TILE_CACHE_SECONDS = int(os.getenv("TILE_CACHE_SECONDS", "60"))
+
+# Ниже этого зума карта получает кластеры, а не отдельные дома
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "15"))
+
+# Как часто (сек) фоновая задача помечает старые жалобы как outdated; 0 — выключено
+REPORT_SWEEP_INTERVAL = int(os.getenv("REPORT_SWEEP_INTERVAL", "600"))
+
+# Размер страницы в списках жалоб и заявок (курсорная пагинация)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Пул соединений (для Postgres; у SQLite свой пул) — бюджет на процесс и на одну базу:
+# делится поровну между sync- и async-движком. По умолчанию до 16 соединений
+# с primary на воркер (было 15 у одного sync-движка)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "6"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Асинхронный движок (asyncpg / aiosqlite); по умолчанию выводится из DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Потоки для генерации превью картинок жалоб
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+# Больше пикселей — отказ при загрузке: 9000×9000 белый PNG весит 250 КБ, а в памяти ~300 МБ
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(25_000_000)))
+
+# Хранилище картинок: "local" (папка UPLOAD_DIR, раздаётся на /uploads) или "s3"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+# Для s3 (нужен boto3); S3_ENDPOINT_URL — для MinIO / локальной заглушки
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+
+# Лимиты запросов: "memory" (в процессе) или "redis" (общий для всех воркеров)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Кеш ответов аналитики: "memory" (в процессе) или "redis" (общий, REDIS_URL)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+
+# Bulk-импорт (python -m app.cli import ...): записей в одной пачке/транзакции
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Выгрузка /export/*: строк в одной пачке серверного курсора
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# Живые обновления карты (/buildings/stream): "memory" (в процессе) или "redis" (pub/sub через REDIS_URL)
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+MAX_STREAM_TILES = int(os.getenv("MAX_STREAM_TILES", "64"))
+
+# Сжатие ответов: "gzip", "brotli" (нужен brotli-asgi, для старых клиентов — gzip) или "off"
+COMPRESSION = os.getenv("COMPRESSION", "gzip")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# Метрики Prometheus на /metrics; заголовки X-DB-Queries / X-DB-Time-Ms в каждом ответе — для отладки
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+DB_QUERY_HEADER = os.getenv("DB_QUERY_HEADER", "0") == "1"
+
+# SQL дольше этого (мс) пишется в лог как медленный
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "200"))
+
+# ?profile=1 отдаёт профиль запроса вместо ответа — только для отладки, не включать в проде
+PROFILING = os.getenv("PROFILING", "0") == "1"
+PROFILER = os.getenv("PROFILER", "cprofile")  # cprofile / pyinstrument
+
+# Реплики для чтения (через запятую): карта, списки, аналитика. Пусто — всё с primary
+DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+# Сколько секунд после записи клиент читает с primary (read-your-writes)
+READ_STICKY_SECONDS = int(os.getenv("READ_STICKY_SECONDS", "10"))
+# Недоступная реплика пропускается на столько секунд
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
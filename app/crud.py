@@ -1,5 +1,12 @@
+from sqlalchemy import func, inspect, literal, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app import models
+from sqlalchemy.schema import CreateColumn
+
+from app import building_status, models, rollups
+from app.database import Base
+from app.geo import CLUSTER_GRID_LEVELS, QUADKEY_ZOOM, quadkey_for, quadkey_range
+from app.scoring import status_from_score
 
 def create_report(db: Session, report_data, building_id, user_hash):
     report = models.Report(
@@ -11,13 +18,343 @@ def create_report(db: Session, report_data, building_id, user_hash):
         user_hash=user_hash
     )
     db.add(report)
+    building_status.apply_report_created(db, building_id, report.severity)
+    rollups.apply_report_created(db, report)
+    increment_report_count(db, building_id)
     db.commit()
     return report
     
+def increment_report_count(db: Session, building_id: int):
+    # Атомарно в SQL, без read-modify-write в Python
+    db.query(models.Building).filter(
+        models.Building.id == building_id
+    ).update({models.Building.report_count: models.Building.report_count + 1}, synchronize_session=False)
+
+
+def backfill_report_counts(db: Session) -> int:
+    counts = (
+        select(func.count(models.Report.id))
+        .where(models.Report.building_id == models.Building.id)
+        .scalar_subquery()
+    )
+    updated = db.query(models.Building).update(
+        {models.Building.report_count: counts}, synchronize_session=False
+    )
+    db.commit()
+    return updated
+
+
+def backfill_confirmation_counts(db: Session) -> int:
+    RC = models.ReportConfirmation
+
+    def counted(kind):
+        return (
+            select(func.count(RC.id))
+            .where(RC.report_id == models.Report.id, RC.type == kind)
+            .scalar_subquery()
+        )
+
+    updated = db.query(models.Report).update(
+        {
+            models.Report.problem_count: counted("problem"),
+            models.Report.resolved_count: counted("resolved"),
+        },
+        synchronize_session=False,
+    )
+    db.commit()
+    return updated
+
+
+def ensure_unique_indexes(db: Session) -> dict:
+    # Для баз, созданных до уникальных индексов: убираем дубли и создаём индексы
+    RC = models.ReportConfirmation
+    HR = models.HelpResponse
+
+    removed = {
+        "report_confirmations": db.query(RC).filter(
+            RC.id.notin_(select(func.min(RC.id)).group_by(RC.report_id, RC.user_hash, RC.type))
+        ).delete(synchronize_session=False),
+        "help_responses": db.query(HR).filter(
+            HR.id.notin_(select(func.min(HR.id)).group_by(HR.help_id, HR.responder_hash))
+        ).delete(synchronize_session=False),
+    }
+    db.commit()
+
+    for table in (RC.__table__, HR.__table__):
+        for index in table.indexes:
+            if index.unique:
+                index.create(db.get_bind(), checkfirst=True)
+
+    return removed
+
+
 def create_building(db: Session, lat: float, lng: float, address: str):
-    building = models.Building(lat=lat, lng=lng, address=address)
+    building = models.Building(lat=lat, lng=lng, address=address, quadkey=quadkey_for(lat, lng))
     db.add(building)
     db.flush()          # ← ВАЖНО
+    building_status.init_building(db, building.id)
     db.commit()
     db.refresh(building)
     return building
+
+
+def in_area(stmt, south=None, west=None, north=None, east=None, quadkey=None):
+    if None not in (south, west, north, east):
+        stmt = stmt.where(
+            models.Building.lat >= south,
+            models.Building.lat <= north,
+            models.Building.lng >= west,
+            models.Building.lng <= east,
+        )
+
+    if quadkey is not None:
+        low, high = quadkey_range(quadkey)
+        stmt = stmt.where(
+            models.Building.quadkey >= low,
+            models.Building.quadkey < high,
+        )
+
+    return stmt
+
+
+# =====================================================
+# КАРТА: select() строится один раз и выполняется
+# и синхронной Session, и AsyncSession
+# =====================================================
+
+def buildings_map_stmt(**area):
+    # Статус берётся из проекции building_status — обычное чтение по ключу
+    stmt = (
+        select(
+            models.Building.id,
+            models.Building.lat,
+            models.Building.lng,
+            models.Building.address,
+            models.Building.positive_count,
+            func.coalesce(models.BuildingStatus.status, "green").label("status"),
+            func.coalesce(models.BuildingStatus.help_count, 0).label("help_count"),
+        )
+        .outerjoin(models.BuildingStatus, models.BuildingStatus.building_id == models.Building.id)
+    )
+
+    return in_area(stmt, **area)
+
+
+def buildings_version_stmt(**area):
+    # Версия области карты: сколько домов и когда последний из них менялся
+    stmt = (
+        select(
+            func.count(models.Building.id).label("count"),
+            func.max(models.BuildingStatus.updated_at).label("updated_at"),
+        )
+        .outerjoin(models.BuildingStatus, models.BuildingStatus.building_id == models.Building.id)
+    )
+
+    return in_area(stmt, **area)
+
+
+def buildings_map_rows(rows):
+    return [
+        {
+            "id": r.id,
+            "lat": r.lat,
+            "lng": r.lng,
+            "address": r.address,
+            "status": r.status,
+            "positive_count": r.positive_count,
+            "help_count": r.help_count,
+        }
+        for r in rows
+    ]
+
+
+def building_clusters_stmt(zoom: int, **area):
+    cell_len = min(zoom + CLUSTER_GRID_LEVELS, QUADKEY_ZOOM)
+    cell = func.substr(models.Building.quadkey, 1, cell_len)
+
+    # Худший цвет клетки = цвет максимальной оценки среди её домов
+    stmt = (
+        select(
+            cell.label("cell"),
+            func.count(models.Building.id).label("count"),
+            func.avg(models.Building.lat).label("lat"),
+            func.avg(models.Building.lng).label("lng"),
+            func.max(func.coalesce(models.BuildingStatus.score, 0)).label("score"),
+        )
+        .outerjoin(models.BuildingStatus, models.BuildingStatus.building_id == models.Building.id)
+        .where(models.Building.quadkey.isnot(None))
+        .group_by(cell)
+    )
+
+    return in_area(stmt, **area)
+
+
+def building_clusters_rows(rows):
+    return [
+        {
+            "type": "cluster",
+            "cell": r.cell,
+            "lat": r.lat,
+            "lng": r.lng,
+            "count": r.count,
+            "status": status_from_score(r.score),
+        }
+        for r in rows
+    ]
+
+
+def get_buildings_map(db: Session, **area):
+    return buildings_map_rows(db.execute(buildings_map_stmt(**area)))
+
+
+def get_building_clusters(db: Session, zoom: int, **area):
+    return building_clusters_rows(db.execute(building_clusters_stmt(zoom, **area)))
+
+
+async def get_buildings_map_async(db: AsyncSession, **area):
+    return buildings_map_rows(await db.execute(buildings_map_stmt(**area)))
+
+
+async def get_building_clusters_async(db: AsyncSession, zoom: int, **area):
+    return building_clusters_rows(await db.execute(building_clusters_stmt(zoom, **area)))
+
+
+def backfill_quadkeys(db: Session, batch_size: int = 1000) -> int:
+    total = 0
+    last_id = 0
+
+    while True:
+        rows = (
+            db.query(models.Building.id, models.Building.lat, models.Building.lng)
+            .filter(models.Building.id > last_id)
+            .order_by(models.Building.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        db.execute(
+            update(models.Building),
+            [{"id": r.id, "quadkey": quadkey_for(r.lat, r.lng)} for r in rows],
+        )
+        db.commit()
+
+        total += len(rows)
+        last_id = rows[-1].id
+
+    return total
+
+
+# =====================================================
+# МИГРАЦИЯ СХЕМЫ: только явно, python -m app.cli migrate
+# =====================================================
+
+# create_all в уже существующие таблицы колонки и индексы не добавляет —
+# всё, что появилось позже, доводится здесь. Старые строки заполняются
+# в том же шаге, что и ALTER TABLE, а не отдельной командой
+SCHEMA_COLUMNS = (
+    (models.Building.__table__.c.quadkey, backfill_quadkeys),
+    (models.Building.__table__.c.report_count, backfill_report_counts),
+    (models.Report.__table__.c.problem_count, backfill_confirmation_counts),
+    (models.Report.__table__.c.resolved_count, backfill_confirmation_counts),
+    # Превью старых картинок не генерируются миграцией: python -m app.cli image-variants
+    (models.Report.__table__.c.image_variants_ready, None),
+)
+SCHEMA_INDEXES = (
+    "ix_buildings_quadkey",
+    "idx_building_lat_lng",
+    "idx_confirmation_report_type_time",
+    "ix_buildings_report_count",
+)
+# Проекции новой таблицей приходят пустыми — пересобираем, если в источнике есть строки
+SCHEMA_PROJECTIONS = (
+    (models.BuildingStatus, models.Building, building_status.rebuild),
+    (models.ReportDailyRollup, models.Report, rollups.rebuild),
+)
+# Поверх дублей не создаются; дубли удаляет только ensure-unique, не миграция
+UNIQUE_INDEXES = (
+    "uq_confirmation_report_user_type",
+    "uq_help_response_responder",
+)
+
+
+def _index(name: str):
+    return next(i for t in Base.metadata.tables.values() for i in t.indexes if i.name == name)
+
+
+def _missing_columns(inspector):
+    existing = {}
+    missing = []
+    for column, backfill in SCHEMA_COLUMNS:
+        table = column.table.name
+        if table not in existing:
+            existing[table] = {c["name"] for c in inspector.get_columns(table)}
+        if column.name not in existing[table]:
+            missing.append((column, backfill))
+    return missing
+
+
+def _missing_indexes(inspector, names):
+    return [
+        name for name in names
+        if name not in {i["name"] for i in inspector.get_indexes(_index(name).table.name)}
+    ]
+
+
+def _has_rows(db: Session, model) -> bool:
+    return db.execute(select(literal(1)).select_from(model.__table__).limit(1)).first() is not None
+
+
+def _empty_projections(db: Session):
+    return [
+        (projection, rebuild)
+        for projection, source, rebuild in SCHEMA_PROJECTIONS
+        if not _has_rows(db, projection) and _has_rows(db, source)
+    ]
+
+
+def pending_migrations(db: Session) -> list:
+    # Что сделает migrate_schema; при старте приложения только проверяем и пишем в лог
+    inspector = inspect(db.get_bind())
+    pending = [f"{c.table.name}.{c.name}" for c, _ in _missing_columns(inspector)]
+    pending += _missing_indexes(inspector, SCHEMA_INDEXES)
+    if not pending:
+        # Пока колонок нет, запросы к таблицам-источникам падают — проекции проверяем после
+        pending += [p.__tablename__ for p, _ in _empty_projections(db)]
+    return pending
+
+
+def missing_unique_indexes(db: Session) -> list:
+    return _missing_indexes(inspect(db.get_bind()), UNIQUE_INDEXES)
+
+
+def migrate_schema(db: Session) -> list:
+    # Идемпотентно. Только из CLI: при старте воркеров параллельные ALTER TABLE
+    # конфликтуют друг с другом
+    bind = db.get_bind()
+    done = []
+
+    missing = _missing_columns(inspect(bind))
+    for column, _ in missing:
+        ddl = CreateColumn(column).compile(dialect=bind.dialect)
+        db.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+        done.append(f"{column.table.name}.{column.name}")
+    db.commit()
+
+    backfills = []
+    for _, backfill in missing:
+        if backfill and backfill not in backfills:
+            backfills.append(backfill)
+    for backfill in backfills:
+        backfill(db)
+
+    for name in _missing_indexes(inspect(bind), SCHEMA_INDEXES):
+        _index(name).create(bind, checkfirst=True)
+        done.append(name)
+
+    for projection, rebuild in _empty_projections(db):
+        rebuild(db)
+        done.append(f"{projection.__tablename__} (rebuild)")
+
+    return done
@@ -1,17 +1,74 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import DATABASE_URL
+from app.config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+
+def engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+
+    # У каждой базы два движка (sync и async) — каждому половина бюджета
+    return {
+        "pool_size": max(1, DB_POOL_SIZE // 2),
+        "max_overflow": DB_MAX_OVERFLOW // 2,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def async_url(url: str) -> str:
+    # postgresql://... -> postgresql+asyncpg://..., sqlite:///... -> sqlite+aiosqlite:///...
+    scheme, rest = url.split("://", 1)
+    driver = {
+        "postgres": "postgresql+asyncpg",
+        "postgresql": "postgresql+asyncpg",
+        "postgresql+psycopg2": "postgresql+asyncpg",
+        "sqlite": "sqlite+aiosqlite",
+    }.get(scheme, scheme)
+    return f"{driver}://{rest}"
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 Base = declarative_base()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для горячих GET-роутов (карта, списки)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL or async_url(DATABASE_URL),
+    **engine_options(DATABASE_URL),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def dialect_insert(db, model):
+    # INSERT ... ON CONFLICT есть и в SQLite, и в Postgres, но через разные диалекты
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    return insert(model)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.config import EVENTS_BACKEND, EVENTS_QUEUE_SIZE, REDIS_URL
+
+# Канал изменений домов на карте (для redis — имя pub/sub канала)
+BUILDINGS_CHANNEL = "buildings"
+
+logger = logging.getLogger(__name__)
+
+
+class _Subscription:
+    # Очередь одного клиента; publish может прийти из любого потока (sync-роуты)
+    def __init__(self, loop, max_queue: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_queue)
+        self.lagged = False  # очередь переполнялась — клиенту нужно перечитать карту
+
+    def push(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # цикл клиента уже закрыт
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+    async def get(self, timeout: float):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoryBus:
+    # Подписчики в памяти процесса — события видят только клиенты этого воркера
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            sub.push(event)
+
+    @asynccontextmanager
+    async def subscribe(self):
+        sub = _Subscription(asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(sub)
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                self._subscribers.discard(sub)
+
+
+class _RedisSubscription:
+    lagged = False
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(message["data"]) if message else None
+
+
+class RedisBus:
+    # Общий канал для всех воркеров: публикует любой, получают все подписчики
+    def __init__(self, url: str):
+        import redis
+
+        self.url = url
+        self.client = redis.Redis.from_url(url)
+
+    def active(self) -> bool:
+        return True  # подписчики могут быть в других процессах
+
+    def publish(self, event: dict):
+        self.client.publish(BUILDINGS_CHANNEL, json.dumps(event, default=str))
+
+    @asynccontextmanager
+    async def subscribe(self):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(BUILDINGS_CHANNEL)
+        try:
+            yield _RedisSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe(BUILDINGS_CHANNEL)
+            await pubsub.close()
+            await client.close()
+
+
+def _create_bus():
+    if EVENTS_BACKEND == "redis":
+        return RedisBus(REDIS_URL)
+
+    return MemoryBus(EVENTS_QUEUE_SIZE)
+
+
+bus = _create_bus()
+
+
+def publish_building(db: Session, building_id: int):
+    # Вызывать после commit: отправляем новое состояние дома в формате карты
+    if not bus.active():
+        return
+
+    try:
+        row = db.execute(
+            crud.buildings_map_stmt()
+            .add_columns(models.Building.quadkey)
+            .where(models.Building.id == building_id)
+        ).first()
+
+        if row:
+            bus.publish({"type": "building", **crud.buildings_map_rows([row])[0], "quadkey": row.quadkey})
+    except Exception:
+        # Запись уже закоммичена — сбой канала не должен ломать ответ
+        logger.exception("publish failed for building %s", building_id)
+
+
+def matches(event: dict, bbox=None, quadkeys=None) -> bool:
+    if bbox:
+        south, west, north, east = bbox
+        if not (south <= event["lat"] <= north and west <= event["lng"] <= east):
+            return False
+
+    if quadkeys:
+        quadkey = event.get("quadkey") or ""
+        if not any(quadkey.startswith(q) for q in quadkeys):
+            return False
+
+    return True
@@ -0,0 +1,41 @@
+import msgpack
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+from app.scoring import STATUS_THRESHOLDS
+
+MSGPACK_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+
+# Цвет дома → код (по возрастанию тяжести) для колоночного формата
+STATUS_CODES = ["green"] + [color for _, color in reversed(STATUS_THRESHOLDS)]
+_STATUS_CODE = {color: code for code, color in enumerate(STATUS_CODES)}
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "")
+    return any(t in accept for t in MSGPACK_TYPES)
+
+
+def columnar(rows: list) -> dict:
+    # [{id, lat, ...}, ...] → {"id": [...], "lat": [...], ...}; цвет — числом
+    keys = list(rows[0]) if rows else []
+    columns = {key: [r[key] for r in rows] for key in keys}
+
+    if "status" in columns:
+        columns["status"] = [_STATUS_CODE[s] for s in columns["status"]]
+
+    return {"count": len(rows), "status_codes": STATUS_CODES, "columns": columns}
+
+
+def map_response(request: Request, rows: list, headers: dict = None) -> Response:
+    # Строки уже готовые dict-ы — без Pydantic и jsonable_encoder
+    headers = {**(headers or {}), "Vary": "Accept"}
+
+    if wants_msgpack(request):
+        return Response(
+            msgpack.packb(columnar(rows)),
+            media_type=MSGPACK_TYPES[0],
+            headers=headers,
+        )
+
+    return ORJSONResponse(rows, headers=headers)
@@ -0,0 +1,58 @@
+import math
+
+# Квадключ храним на этом уровне — ~38 м на клетку, точнее для карты не нужно
+QUADKEY_ZOOM = 20
+
+MAX_LAT = 85.05112878
+
+# Кластер = клетка на CLUSTER_GRID_LEVELS уровней глубже тайла (4x4 клетки на тайл)
+CLUSTER_GRID_LEVELS = 2
+
+
+def lat_lng_to_tile(lat: float, lng: float, z: int):
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    n = 1 << z
+
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_to_quadkey(x: int, y: int, z: int) -> str:
+    digits = []
+
+    for i in range(z, 0, -1):
+        mask = 1 << (i - 1)
+        digit = 0
+        if x & mask:
+            digit += 1
+        if y & mask:
+            digit += 2
+        digits.append(str(digit))
+
+    return "".join(digits)
+
+
+def quadkey_for(lat: float, lng: float) -> str:
+    x, y = lat_lng_to_tile(lat, lng, QUADKEY_ZOOM)
+    return tile_to_quadkey(x, y, QUADKEY_ZOOM)
+
+
+def quadkey_range(prefix: str):
+    # Все ключи с префиксом лежат в [prefix, prefix + "4") — цифры только 0..3,
+    # так что это обычный range scan по индексу, без LIKE
+    return prefix, prefix + "4"
+
+
+def tile_bounds(x: int, y: int, z: int):
+    n = 1 << z
+
+    def lat_of(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+
+    return lat_of(y + 1), west, lat_of(y), east  # south, west, north, east
@@ -0,0 +1,85 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from app import models
+from app.config import IMAGE_MAX_PIXELS, IMAGE_WORKERS
+from app.database import SessionLocal
+from app.storage import storage
+from app.uploads import TMP_DIR, VARIANT_WIDTHS, variant_path
+
+logger = logging.getLogger(__name__)
+
+# Больше — PIL сам откажется декодировать (старые картинки, загруженные до лимита)
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-variants")
+
+
+def generate_variants(key: str):
+    targets = [(w, variant_path(key, w)) for w in VARIANT_WIDTHS]
+    targets = [(w, t) for w, t in targets if not storage.exists(t)]
+    if not targets:
+        return
+
+    os.makedirs(TMP_DIR, exist_ok=True)
+
+    with storage.open(key) as src, Image.open(src) as img:
+        # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8), не меньше самого крупного превью
+        largest = max(VARIANT_WIDTHS)
+        img.draft("RGB", (largest, largest))
+
+        img = ImageOps.exif_transpose(img)  # фото с телефона — с учётом поворота
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+        for width, target in targets:
+            # Не увеличиваем: маленький оригинал просто перекодируется в WebP
+            if img.width > width:
+                height = round(img.height * width / img.width)
+                variant = img.resize((width, height), Image.LANCZOS)
+            else:
+                variant = img
+
+            fd, tmp = tempfile.mkstemp(dir=TMP_DIR, suffix=".webp")
+            os.close(fd)
+            variant.save(tmp, "WEBP", quality=80, method=4)
+            storage.put_file(tmp, target, "image/webp")
+
+
+def mark_ready(key: str):
+    # Все жалобы с этой картинкой (она одна на одинаковое содержимое) получают превью
+    with SessionLocal() as db:
+        db.query(models.Report).filter(
+            models.Report.image_path == storage.url(key)
+        ).update({models.Report.image_variants_ready: True}, synchronize_session=False)
+        db.commit()
+
+
+def _generate_safe(key: str):
+    try:
+        generate_variants(key)
+        mark_ready(key)
+    except Exception:
+        logger.exception("image variants failed for %s", key)
+
+
+def schedule_variants(key: str):
+    _executor.submit(_generate_safe, key)
+
+
+def backfill_variants() -> int:
+    count = 0
+
+    for key in list(storage.keys()):
+        stem, ext = os.path.splitext(key)
+        if "_w" in os.path.basename(stem) or ext.lower() not in (".jpg", ".jpeg", ".png", ".webp"):
+            continue
+
+        _generate_safe(key)
+        count += 1
+
+    return count
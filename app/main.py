@@ -1,20 +1,82 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
-from app.database import Base, engine
+from app import crud, metrics
+from app.profiling import ProfilerMiddleware
+from app.replicas import REPLICA_URLS, StickyCookieMiddleware, async_replica_engines, replica_engines
+from app.config import (
+    COMPRESSION,
+    COMPRESSION_MIN_SIZE,
+    DB_QUERY_HEADER,
+    METRICS_ENABLED,
+    PROFILING,
+    REPORT_SWEEP_INTERVAL,
+    UPLOAD_DIR,
+)
+from app.database import Base, SessionLocal, async_engine, engine
+from app.pagination import NEXT_CURSOR_HEADER
+from app.storage import ImmutableStaticFiles
+from app.uploads import UploadLimitMiddleware
+from app.sweeper import run_sweeper
 from app.routers import buildings, reports
 from app.routers import analytics
+from app.routers import export
 from app.routers import neighbor_help
 
-from fastapi.staticfiles import StaticFiles
 import os
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = None
+    if REPORT_SWEEP_INTERVAL > 0:
+        sweeper = asyncio.create_task(run_sweeper(REPORT_SWEEP_INTERVAL))
+
+    yield
+
+    if sweeper:
+        sweeper.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Слишком большое тело POST /reports/ обрываем до разбора multipart
+app.add_middleware(UploadLimitMiddleware)
+
+# Read-your-writes после записи — cookie, а не память воркера
+if REPLICA_URLS:
+    app.add_middleware(StickyCookieMiddleware)
 app.include_router(neighbor_help.router)
 
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Имена файлов неизменяемые (хеш содержимого / uuid) — отдаём с immutable-кешем
+app.mount("/uploads", ImmutableStaticFiles(directory=UPLOAD_DIR), name="uploads")
+
+# 🔬 ?profile=1 — внутри сжатия, отчёт тоже сжимается
+if PROFILING:
+    app.add_middleware(ProfilerMiddleware)
+
+# Сжатие ответов больше COMPRESSION_MIN_SIZE байт (SSE-поток не сжимается)
+if COMPRESSION == "brotli":
+    from brotli_asgi import BrotliMiddleware
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+    app.add_middleware(
+        BrotliMiddleware,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        gzip_fallback=True,
+        excluded_handlers=["/buildings/stream"],
+    )
+elif COMPRESSION == "gzip":
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 # CORS: обязательно для фронта на localhost:5173
 app.add_middleware(
@@ -29,13 +91,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER]
+    + ([metrics.QUERY_COUNT_HEADER, metrics.DB_TIME_HEADER] if DB_QUERY_HEADER else []),
 )
 
+# 📈 Снаружи всех middleware — чтобы латентность включала сжатие и CORS
+if METRICS_ENABLED:
+    for db_engine in [engine, async_engine, *replica_engines, *async_replica_engines]:
+        metrics.instrument_engine(db_engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 Base.metadata.create_all(bind=engine)
 
+# Схему старой базы доводит только python -m app.cli migrate / ensure-unique —
+# здесь лишь громко предупреждаем, что это не сделано
+with SessionLocal() as db:
+    pending = crud.pending_migrations(db)
+    if pending:
+        logger.error("⚠️ схема базы устарела (%s): выполните python -m app.cli migrate", ", ".join(pending))
+
+    missing_unique = crud.missing_unique_indexes(db)
+    if missing_unique:
+        logger.error(
+            "⚠️ нет уникальных индексов (%s): подтверждения и отклики будут падать, "
+            "выполните python -m app.cli ensure-unique",
+            ", ".join(missing_unique),
+        )
+
 app.include_router(buildings.router)
 app.include_router(reports.router)
 app.include_router(analytics.router)
+app.include_router(export.router)
 
 
 @app.get("/")
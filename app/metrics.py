@@ -0,0 +1,201 @@
+"""Метрики: число SQL-запросов и время БД на запрос, латентность по роутам.
+
+Отдаются на /metrics в текстовом формате Prometheus. Счётчики живут в памяти
+процесса — при нескольких воркерах Prometheus опрашивает каждый отдельно.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from app.config import DB_QUERY_HEADER, SLOW_QUERY_MS
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time-Ms"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # значения меток -> [счётчики корзин..., сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+
+        with self._lock:
+            items = sorted(self._series.items())
+
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            for bound, count in zip(self.buckets, series):
+                yield f'{self.name}_bucket{{{labels},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}'
+            yield f"{self.name}_sum{{{labels}}} {series[-2]}"
+            yield f"{self.name}_count{{{labels}}} {series[-1]}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+
+        with self._lock:
+            items = sorted(self._values.items())
+
+        for label_values, value in items:
+            yield f"{self.name}{{{_labels(self.labels, label_values)}}} {value}"
+
+
+def _labels(names, values) -> str:
+    def escape(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values))
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время ответа по роутам",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL-запросов на один HTTP-запрос (N+1 видно здесь)",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Суммарное время SQL на один HTTP-запрос",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total", f"SQL-запросы дольше {SLOW_QUERY_MS} мс",
+    ("route",),
+)
+
+METRICS = (REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, SLOW_QUERIES)
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# =====================================================
+# SQL: счётчики текущего запроса
+# =====================================================
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_time")
+
+    def __init__(self, scope):
+        self.scope = scope  # роут в scope проставит роутер уже после middleware
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# Объект общий для запроса — его видят и sync-роуты в пуле потоков (контекст копируется)
+_current: ContextVar = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = _route_path(stats.scope) if stats else "-"
+        SLOW_QUERIES.inc(route)
+        logger.warning("slow query %.0f ms [%s]: %s", elapsed * 1000, route, " ".join(statement.split())[:1000])
+
+
+def instrument_engine(engine):
+    # Для AsyncEngine события вешаются на его sync_engine
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# =====================================================
+# ASGI: латентность и запросы по шаблону роута
+# =====================================================
+
+def _route_path(scope) -> str:
+    # Шаблон (/reports/buildings/{building_id}/reports), а не сам URL — иначе метки без конца
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_stats(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if DB_QUERY_HEADER:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(QUERY_COUNT_HEADER, str(stats.queries))
+                    headers.append(DB_TIME_HEADER, f"{stats.db_time * 1000:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+
+            method = scope["method"]
+            route = _route_path(scope)
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, route, status)
+            REQUEST_QUERIES.observe(stats.queries, method, route)
+            REQUEST_DB_TIME.observe(stats.db_time, method, route)
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
 from datetime import datetime
 from app.database import Base
+from app.uploads import image_variants
 from sqlalchemy import Column, String
 
 class Building(Base):
@@ -13,6 +14,8 @@ class Building(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     positive_count = Column(Integer, default=0)
     last_positive_at = Column(DateTime, nullable=True)
+    quadkey = Column(String, nullable=True, index=True)  # тайл z=20, см. app/geo.py
+    report_count = Column(Integer, default=0, server_default="0", nullable=False, index=True)  # для топа домов
 
 
 class Report(Base):
@@ -28,6 +31,14 @@ class Report(Base):
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     status = Column(String, default="open", nullable=False)
     image_path = Column(String, nullable=True)  # ← НОВОЕ ПОЛЕ
+    problem_count = Column(Integer, default=0, server_default="0", nullable=False)
+    resolved_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Превью сгенерированы (app/images.py) — до этого отдаём только image_path
+    image_variants_ready = Column(Boolean, default=False, server_default="0", nullable=False)
+
+    @property
+    def image_variants(self):
+        return image_variants(self.image_path) if self.image_variants_ready else None
     
 class ReportConfirmation(Base):
     __tablename__ = "report_confirmations"
@@ -41,6 +52,21 @@ class ReportConfirmation(Base):
 
 Index("idx_report_user_time", Report.user_hash, Report.created_at)
 Index("idx_report_building_time", Report.building_id, Report.created_at)
+Index("idx_building_lat_lng", Building.lat, Building.lng)
+Index(
+    "idx_confirmation_report_type_time",
+    ReportConfirmation.report_id,
+    ReportConfirmation.type,
+    ReportConfirmation.created_at,
+)
+# Один пользователь — одно подтверждение каждого типа (INSERT ... ON CONFLICT DO NOTHING)
+Index(
+    "uq_confirmation_report_user_type",
+    ReportConfirmation.report_id,
+    ReportConfirmation.user_hash,
+    ReportConfirmation.type,
+    unique=True,
+)
 
 class NeighborHelp(Base):
     __tablename__ = "neighbor_help"
@@ -65,4 +91,42 @@ class HelpResponse(Base):
     id = Column(Integer, primary_key=True, index=True)
     help_id = Column(Integer, ForeignKey("neighbor_help.id"))
     responder_hash = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+Index("uq_help_response_responder", HelpResponse.help_id, HelpResponse.responder_hash, unique=True)
+
+class BuildingStatus(Base):
+    # Проекция статуса дома для карты — обновляется при записи, а не при чтении
+    __tablename__ = "building_status"
+
+    building_id = Column(Integer, ForeignKey("buildings.id"), primary_key=True)
+    score = Column(Integer, default=0, nullable=False)
+    status = Column(String, default="green", nullable=False)
+    help_count = Column(Integer, default=0, nullable=False)
+    last_activity_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ReportDailyRollup(Base):
+    # Жалобы по дням × дом × категория × серьёзность — для аналитики без скана reports
+    __tablename__ = "report_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    building_id = Column(Integer, ForeignKey("buildings.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    severity = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+Index("idx_rollup_building_day", ReportDailyRollup.building_id, ReportDailyRollup.day)
+Index("idx_rollup_category_day", ReportDailyRollup.category, ReportDailyRollup.day)
+
+
+class ImportProgress(Base):
+    # Чекпоинт bulk-импорта: сколько записей файла уже закоммичено (для --resume)
+    __tablename__ = "import_progress"
+
+    source = Column(String, primary_key=True)  # "buildings:/abs/path.csv"
+    records = Column(Integer, default=0, nullable=False)
+    inserted = Column(Integer, default=0, nullable=False)
+    rejected = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
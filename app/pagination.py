@@ -0,0 +1,70 @@
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import load_only
+
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    # Общие query-параметры списков: ?cursor=&limit=&fields=
+    def __init__(
+        self,
+        cursor: Optional[int] = Query(default=None, ge=1),
+        limit: int = Query(default=PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+        fields: Optional[str] = Query(default=None),
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.fields = fields.split(",") if fields else None
+
+    def check_fields(self, schema):
+        if self.fields is None:
+            return
+
+        unknown = [f for f in self.fields if f not in schema.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown)}")
+
+    def load_only(self, model, *always):
+        # Не тянем из БД колонки, которые клиент не просил (text, description...)
+        columns = [getattr(model, f) for f in self.fields if f in model.__table__.columns]
+        return load_only(model.id, *columns, *always)
+
+
+def keyset(query, id_column, page: PageParams):
+    # Keyset по id desc: WHERE id < cursor ORDER BY id DESC LIMIT n+1.
+    # Работает и с Query, и с select()
+    if page.cursor is not None:
+        query = query.filter(id_column < page.cursor)
+
+    return query.order_by(id_column.desc()).limit(page.limit + 1)
+
+
+def split_page(items, page: PageParams, key=lambda item: item.id):
+    next_cursor = None
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        next_cursor = key(items[-1])
+
+    return items, next_cursor
+
+
+def page_response(items, next_cursor, page: PageParams, response: Response, headers: dict = None):
+    headers = dict(headers or {})
+    if next_cursor is not None:
+        headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+
+    if page.fields is None:
+        response.headers.update(headers)
+        return items
+
+    # С fields= отдаём урезанные объекты, мимо response_model
+    return JSONResponse(
+        jsonable_encoder([{f: getattr(item, f) for f in page.fields} for item in items]),
+        headers=headers,
+    )
@@ -0,0 +1,82 @@
+"""Профилирование отдельного запроса: ?profile=1 вместо ответа вернёт отчёт.
+
+Включается только PROFILING=1 — в проде параметр игнорируется.
+PROFILER=cprofile (по умолчанию, текст pstats) или pyinstrument (HTML, нужен pyinstrument).
+cProfile видит поток event loop: async-роуты целиком, у sync-роутов — только ожидание пула потоков.
+"""
+import cProfile
+import io
+import pstats
+from urllib.parse import parse_qs
+
+from starlette.responses import HTMLResponse, PlainTextResponse
+
+from app.config import PROFILER
+
+# Сколько строк pstats показывать
+PROFILE_LINES = 60
+
+
+def _wants_profile(scope) -> bool:
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("profile", ["0"])[0] == "1"
+
+
+class _CProfile:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def response(self, status: int):
+        out = io.StringIO()
+        out.write(f"status: {status}\n\n")
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        return PlainTextResponse(out.getvalue())
+
+
+class _Pyinstrument:
+    def __init__(self):
+        from pyinstrument import Profiler
+
+        self.profiler = Profiler(async_mode="enabled")
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def response(self, status: int):
+        return HTMLResponse(self.profiler.output_html())
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = _Pyinstrument() if PROFILER == "pyinstrument" else _CProfile()
+        status = 500
+
+        async def swallow(message):
+            # Настоящий ответ не отправляем — клиент получит отчёт
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, swallow)
+        finally:
+            profiler.stop()
+
+        await profiler.response(status)(scope, receive, send)
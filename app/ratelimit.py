@@ -0,0 +1,145 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from fastapi import HTTPException
+
+from app.config import RATE_LIMIT_BACKEND, REDIS_URL
+
+
+class RateLimit:
+    # Не больше limit событий за window секунд на ключ (скользящее окно)
+    def __init__(self, name: str, limit: int, window: int, status_code: int, detail: str):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.status_code = status_code
+        self.detail = detail
+
+    def key(self, subject: str) -> str:
+        return f"rl:{self.name}:{subject}"
+
+
+class MemoryBackend:
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._events = {}  # key -> (window, deque[timestamp])
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def _trim(self, events, window, now):
+        while events and events[0] <= now - window:
+            events.popleft()
+
+    def acquire(self, entries, now):
+        # entries: [(key, window, limit)]; проверка и запись под одним локом.
+        # Возвращает (индекс превышенного лимита, None) или (None, токен для release)
+        with self._lock:
+            for i, (key, window, limit) in enumerate(entries):
+                item = self._events.get(key)
+                if item is not None:
+                    self._trim(item[1], window, now)
+                    if len(item[1]) >= limit:
+                        return i, None
+
+            for key, window, _ in entries:
+                self._events.setdefault(key, (window, deque()))[1].append(now)
+
+            self._ops += 1
+            if self._ops % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+        return None, [(key, now) for key, _, _ in entries]
+
+    def release(self, token):
+        with self._lock:
+            for key, now in token:
+                item = self._events.get(key)
+                if item is not None and now in item[1]:
+                    item[1].remove(now)
+
+    def _prune(self, now):
+        # Выкидываем ключи, у которых всё окно уже истекло
+        for key in list(self._events):
+            window, events = self._events[key]
+            self._trim(events, window, now)
+            if not events:
+                del self._events[key]
+
+
+# KEYS — ключи лимитов; ARGV: now, member, затем пары (window, limit) по каждому ключу.
+# Скрипт в Redis выполняется атомарно — между проверкой и ZADD никто не вклинится
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - tonumber(ARGV[2 * i + 1]))
+    if redis.call('ZCARD', key) >= tonumber(ARGV[2 * i + 2]) then
+        return i
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('EXPIRE', key, math.ceil(tonumber(ARGV[2 * i + 1])) + 1)
+end
+return 0
+"""
+
+
+class RedisBackend:
+    # Окно = sorted set с временем событий в score
+    def __init__(self, client):
+        self.client = client
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+
+    def acquire(self, entries, now):
+        member = f"{now}:{uuid.uuid4().hex}"
+        args = [now, member]
+        for _, window, limit in entries:
+            args += [window, limit]
+
+        denied = self._acquire(keys=[key for key, _, _ in entries], args=args)
+        if denied:
+            return denied - 1, None
+
+        return None, [(key, member) for key, _, _ in entries]
+
+    def release(self, token):
+        pipe = self.client.pipeline()
+        for key, member in token:
+            pipe.zrem(key, member)
+        pipe.execute()
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def acquire(self, *checks):
+        # checks: (RateLimit, subject). Проверка и учёт события — один атомарный шаг,
+        # иначе параллельные запросы проходят проверку все разом.
+        # Первый превышенный лимит -> HTTPException; иначе токен для release
+        entries = [(limit.key(subject), limit.window, limit.limit) for limit, subject in checks]
+        denied, token = self.backend.acquire(entries, time.time())
+        if denied is not None:
+            limit = checks[denied][0]
+            raise HTTPException(status_code=limit.status_code, detail=limit.detail)
+
+        return token
+
+    def release(self, token):
+        # Запрос не удался (404, плохая картинка, ошибка БД) — событие не считаем
+        self.backend.release(token)
+
+
+def _create_backend():
+    if RATE_LIMIT_BACKEND == "redis":
+        import redis
+
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+
+    return MemoryBackend()
+
+
+limiter = RateLimiter(_create_backend())
@@ -0,0 +1,220 @@
+"""Чтение с реплик: карта, списки жалоб/заявок, аналитика.
+
+Реплики перебираются по кругу; недоступная пропускается REPLICA_RETRY_SECONDS,
+а если живых нет — читаем с primary. Клиент, который только что писал,
+READ_STICKY_SECONDS читает с primary (read-your-writes), чтобы не увидеть
+свою жалобу «пропавшей» из-за отставания реплики. Метка — cookie (попадает
+в любой воркер) и, для клиентов без cookie, запись по IP.
+Без DATABASE_REPLICA_URLS всё читается с primary, как раньше.
+"""
+import itertools
+import logging
+import threading
+import time
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import (
+    CACHE_BACKEND,
+    DATABASE_REPLICA_URLS,
+    READ_STICKY_SECONDS,
+    REDIS_URL,
+    REPLICA_RETRY_SECONDS,
+)
+from app.database import AsyncSessionLocal, SessionLocal, async_url, engine_options
+
+logger = logging.getLogger(__name__)
+
+REPLICA_URLS = [url.strip() for url in DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+
+class ReadRouter:
+    def __init__(self, engines):
+        self.engines = engines
+        self._turn = itertools.count()
+        self._down_until = {}
+
+    def candidates(self):
+        # Все живые реплики, начиная со следующей по кругу
+        if not self.engines:
+            return []
+
+        n = len(self.engines)
+        start = next(self._turn)
+        now = time.monotonic()
+
+        return [
+            e for e in (self.engines[(start + i) % n] for i in range(n))
+            if self._down_until.get(e, 0) <= now
+        ]
+
+    def mark_down(self, engine):
+        self._down_until[engine] = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning("replica %s unavailable, skipping for %ss", engine.url, REPLICA_RETRY_SECONDS)
+
+
+replica_engines = [create_engine(url, **engine_options(url)) for url in REPLICA_URLS]
+async_replica_engines = [create_async_engine(async_url(url), **engine_options(url)) for url in REPLICA_URLS]
+
+read_router = ReadRouter(replica_engines)
+async_read_router = ReadRouter(async_replica_engines)
+
+ReplicaSession = sessionmaker(autocommit=False, autoflush=False)
+AsyncReplicaSession = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+
+# =====================================================
+# READ-YOUR-WRITES
+# =====================================================
+
+class MemoryMarkers:
+    # Отдельно от кеша ответов: только TTL, без LRU — аналитика метки не вытесняет
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._until = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def set(self, key, ttl: int):
+        now = time.monotonic()
+        with self._lock:
+            self._until[key] = now + ttl
+
+            self._ops += 1
+            if self._ops % self.PRUNE_EVERY == 0:
+                for k in [k for k, until in self._until.items() if until <= now]:
+                    del self._until[k]
+
+    def active(self, key) -> bool:
+        with self._lock:
+            return self._until.get(key, 0) > time.monotonic()
+
+
+class RedisMarkers:
+    # Свои ключи read-primary:*, не в пространстве cache:* ответов
+    def __init__(self, client):
+        self.client = client
+
+    def set(self, key, ttl: int):
+        self.client.setex(key, ttl, 1)
+
+    def active(self, key) -> bool:
+        return bool(self.client.exists(key))
+
+
+def _create_markers():
+    # Тот же бэкенд, что у кеша: с redis метка видна всем воркерам
+    if CACHE_BACKEND == "redis":
+        import redis
+
+        return RedisMarkers(redis.Redis.from_url(REDIS_URL))
+
+    return MemoryMarkers()
+
+
+markers = _create_markers()
+
+
+STICKY_COOKIE = "read_primary"
+
+
+def _sticky_key(request: Request) -> str:
+    # Тот же идентификатор клиента, что и в user_hash — IP
+    return f"read-primary:{request.client.host}"
+
+
+def stick_to_primary(request: Request):
+    # Вызывать из пишущих роутов после commit
+    if REPLICA_URLS:
+        markers.set(_sticky_key(request), READ_STICKY_SECONDS)
+        request.state.read_primary = True  # StickyCookieMiddleware поставит cookie
+
+
+def _on_primary(request: Request) -> bool:
+    if not REPLICA_URLS:
+        return True
+
+    return STICKY_COOKIE in request.cookies or markers.active(_sticky_key(request))
+
+
+class StickyCookieMiddleware:
+    # Cookie не зависит от воркера: MemoryMarkers живут в одном процессе,
+    # а следующий GET автора обычно приходит в другой
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and scope.get("state", {}).get("read_primary"):
+                # SameSite=None — фронт на другом домене (cityhelp.app, pages.dev)
+                MutableHeaders(scope=message).append(
+                    "Set-Cookie",
+                    f"{STICKY_COOKIE}=1; Max-Age={READ_STICKY_SECONDS}; Path=/; HttpOnly; Secure; SameSite=None",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+def cache_ttl(db, ttl: int) -> int:
+    # Посчитанное на реплике могло не увидеть последних записей: после bump версии
+    # такой ответ не должен жить весь TTL — держим его не дольше окна read-your-writes
+    return min(ttl, READ_STICKY_SECONDS) if db.info.get("replica") else ttl
+
+
+# =====================================================
+# ЗАВИСИМОСТИ
+# =====================================================
+
+def _open_replica():
+    for replica in read_router.candidates():
+        db = ReplicaSession(bind=replica, info={"replica": True})
+        try:
+            db.connection()  # соединение сразу — чтобы упасть здесь, а не посреди роута
+            return db
+        except (DBAPIError, OSError):
+            db.close()
+            read_router.mark_down(replica)
+
+    return None
+
+
+async def _open_async_replica():
+    for replica in async_read_router.candidates():
+        db = AsyncReplicaSession(bind=replica, info={"replica": True})
+        try:
+            await db.connection()
+            return db
+        except (DBAPIError, OSError):
+            await db.close()
+            async_read_router.mark_down(replica)
+
+    return None
+
+
+def get_read_db(request: Request):
+    db = None if _on_primary(request) else _open_replica()
+    db = db or SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    db = None if _on_primary(request) else await _open_async_replica()
+    db = db or AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
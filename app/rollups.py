@@ -0,0 +1,67 @@
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import dialect_insert
+from app.models import ReportDailyRollup
+
+
+# =====================================================
+# ИНКРЕМЕНТАЛЬНЫЕ ОБНОВЛЕНИЯ (в транзакции вызывающего, без commit)
+# =====================================================
+
+def _add(db: Session, report, severity: str, delta: int):
+    if report.created_at is None:
+        db.flush()  # created_at проставляется default-ом при flush
+
+    stmt = dialect_insert(db, ReportDailyRollup).values(
+        day=report.created_at.date(),
+        building_id=report.building_id,
+        category=str(getattr(report.category, "value", report.category)),
+        severity=str(getattr(severity, "value", severity)),
+        count=delta,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["day", "building_id", "category", "severity"],
+        set_={"count": ReportDailyRollup.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def apply_report_created(db: Session, report):
+    _add(db, report, report.severity, +1)
+
+
+def apply_severity_change(db: Session, report, old: str, new: str):
+    _add(db, report, old, -1)
+    _add(db, report, new, +1)
+
+
+# =====================================================
+# ПОЛНЫЙ ПЕРЕСЧЁТ (бэкфилл)
+# =====================================================
+
+def rebuild(db: Session) -> int:
+    day = func.date(models.Report.created_at)
+
+    db.query(ReportDailyRollup).delete(synchronize_session=False)
+    db.execute(
+        insert(ReportDailyRollup).from_select(
+            ["day", "building_id", "category", "severity", "count"],
+            db.query(
+                day,
+                models.Report.building_id,
+                models.Report.category,
+                models.Report.severity,
+                func.count(models.Report.id),
+            ).group_by(
+                day,
+                models.Report.building_id,
+                models.Report.category,
+                models.Report.severity,
+            ),
+        )
+    )
+    db.commit()
+
+    return db.query(ReportDailyRollup).count()
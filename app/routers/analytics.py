@@ -1,29 +1,70 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional
 
-from app.database import get_db
-from app import models
+from app.cache import ANALYTICS, cached_json
+from app.config import ANALYTICS_CACHE_TTL
+from app.replicas import cache_ttl, get_read_db
+from app import models, schemas
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 # ТОП ДОМОВ
 @router.get("/top-buildings")
-def top_buildings(db: Session = Depends(get_db)):
-    results = (
-        db.query(
+def top_buildings(
+    request: Request,
+    limit: int = Query(default=10, ge=1, le=100),
+    days: Optional[int] = Query(default=None, ge=1, le=365),
+    south: Optional[float] = Query(default=None),
+    west: Optional[float] = Query(default=None),
+    north: Optional[float] = Query(default=None),
+    east: Optional[float] = Query(default=None),
+    db: Session = Depends(get_read_db),
+):
+    bbox = (south, west, north, east)
+    key = f"top-buildings:{limit}:{days}:{bbox}"
+    compute = lambda: _top_buildings(db, limit, days, bbox)
+    return cached_json(request, ANALYTICS, key, compute, cache_ttl(db, ANALYTICS_CACHE_TTL))
+
+
+def _top_buildings(db: Session, limit: int = 10, days=None, bbox=(None, None, None, None)):
+    if days is None:
+        # За всё время — готовый счётчик Building.report_count с индексом
+        reports_count = models.Building.report_count
+        q = db.query(
             models.Building.id.label("id"),
             models.Building.address.label("address"),
-            func.count(models.Report.id).label("reports_count")
+            reports_count.label("reports_count")
+        )
+    else:
+        # За окно — сумма по дневным агрегатам, а не по сырым жалобам
+        R = models.ReportDailyRollup
+        since = (datetime.utcnow() - timedelta(days=days)).date()
+        reports_count = func.sum(R.count)
+        q = (
+            db.query(
+                models.Building.id.label("id"),
+                models.Building.address.label("address"),
+                reports_count.label("reports_count")
+            )
+            .join(R, R.building_id == models.Building.id)
+            .filter(R.day >= since)
+            .group_by(models.Building.id, models.Building.address)
         )
-        .outerjoin(models.Report, models.Building.id == models.Report.building_id)
-        .group_by(models.Building.id, models.Building.address)
-        .order_by(func.count(models.Report.id).desc())
-        .limit(10)
-        .all()
-    )
+
+    south, west, north, east = bbox
+    if None not in bbox:
+        q = q.filter(
+            models.Building.lat >= south,
+            models.Building.lat <= north,
+            models.Building.lng >= west,
+            models.Building.lng <= east,
+        )
+
+    results = q.order_by(reports_count.desc()).limit(limit).all()
 
     return [
         {
@@ -37,13 +78,22 @@ def top_buildings(db: Session = Depends(get_db)):
 
 # СТАТИСТИКА ПО СЕРЬЕЗНОСТИ
 @router.get("/severity-stats")
-def severity_stats(db: Session = Depends(get_db)):
+def severity_stats(request: Request, db: Session = Depends(get_read_db)):
+    compute = lambda: _severity_stats(db)
+    return cached_json(request, ANALYTICS, "severity-stats", compute, cache_ttl(db, ANALYTICS_CACHE_TTL))
+
+
+def _severity_stats(db: Session):
+    R = models.ReportDailyRollup
+    total = func.sum(R.count)
+
     results = (
         db.query(
-            models.Report.severity.label("severity"),
-            func.count(models.Report.id).label("count")
+            R.severity.label("severity"),
+            total.label("count")
         )
-        .group_by(models.Report.severity)
+        .group_by(R.severity)
+        .having(total > 0)
         .all()
     )
 
@@ -55,21 +105,61 @@ def severity_stats(db: Session = Depends(get_db)):
 
 # ЖАЛОБЫ ПО ДНЯМ
 @router.get("/reports-by-day")
-def reports_by_day(db: Session = Depends(get_db)):
-    since = datetime.utcnow() - timedelta(days=30)
+def reports_by_day(request: Request, db: Session = Depends(get_read_db)):
+    compute = lambda: _reports_by_day(db)
+    return cached_json(request, ANALYTICS, "reports-by-day", compute, cache_ttl(db, ANALYTICS_CACHE_TTL))
 
-    results = (
-        db.query(
-            func.date(models.Report.created_at).label("date"),
-            func.count(models.Report.id).label("count")
-        )
-        .filter(models.Report.created_at >= since)
-        .group_by(func.date(models.Report.created_at))
-        .order_by(func.date(models.Report.created_at))
-        .all()
-    )
 
+def _reports_by_day(db: Session):
+    since = (datetime.utcnow() - timedelta(days=30)).date()
+    return _rollup_stats(db, "day", date_from=since)
+
+
+# ПРОИЗВОЛЬНЫЙ СРЕЗ ПО ДНЕВНЫМ АГРЕГАТАМ
+STATS_GROUPS = {
+    "day": models.ReportDailyRollup.day,
+    "category": models.ReportDailyRollup.category,
+    "severity": models.ReportDailyRollup.severity,
+    "building": models.ReportDailyRollup.building_id,
+}
+
+
+@router.get("/stats")
+def stats(
+    request: Request,
+    group_by: str = Query(default="day", pattern="^(day|category|severity|building)$"),
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    category: Optional[schemas.ReportCategory] = Query(default=None),
+    severity: Optional[schemas.ReportSeverity] = Query(default=None),
+    db: Session = Depends(get_read_db),
+):
+    key = f"stats:{group_by}:{date_from}:{date_to}:{category}:{severity}"
+    compute = lambda: _rollup_stats(db, group_by, date_from, date_to, category, severity)
+    return cached_json(request, ANALYTICS, key, compute, cache_ttl(db, ANALYTICS_CACHE_TTL))
+
+
+def _rollup_stats(db: Session, group_by: str, date_from=None, date_to=None, category=None, severity=None):
+    R = models.ReportDailyRollup
+    column = STATS_GROUPS[group_by]
+    total = func.sum(R.count)
+
+    q = db.query(column.label("key"), total.label("count"))
+
+    if date_from is not None:
+        q = q.filter(R.day >= date_from)
+    if date_to is not None:
+        q = q.filter(R.day <= date_to)
+    if category is not None:
+        q = q.filter(R.category == category.value)
+    if severity is not None:
+        q = q.filter(R.severity == severity.value)
+
+    results = q.group_by(column).having(total > 0).order_by(column).all()
+
+    # Для дней сохраняем прежний формат ответа /reports-by-day
+    name = "date" if group_by == "day" else group_by
     return [
-        {"date": str(r.date), "count": r.count}
+        {name: str(r.key) if group_by == "day" else r.key, "count": r.count}
         for r in results
     ]
@@ -1,100 +1,158 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, or_, update
 from sqlalchemy.orm import Session
 
+from app.config import CLUSTER_MAX_ZOOM, MAX_STREAM_TILES, SSE_HEARTBEAT_SECONDS, TILE_CACHE_SECONDS
 from app.database import get_db
-from app.models import Building, Report, NeighborHelp
-from app import schemas
+from app.geo import QUADKEY_ZOOM, quadkey_for, tile_to_quadkey
+from app.models import Building
+from app import building_status, crud, schemas
+from app.cache import conditional
+from app.events import bus, matches, publish_building
+from app.formats import map_response
+from app.replicas import get_async_read_db, stick_to_primary
+from app.scoring import SEVERITY_WEIGHTS, status_from_score
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/buildings", tags=["buildings"])
 
 
 def calculate_building_status(reports: list) -> str:
-    if not reports:
-        return "green"
+    score = sum(SEVERITY_WEIGHTS.get(r.severity, 0) for r in reports)
+    return status_from_score(score)
 
-    score = 0
 
-    for r in reports:
-        if r.severity == "high":
-            score += 3
-        elif r.severity == "medium":
-            score += 1
+@router.get("/")
+async def get_buildings(
+    request: Request,
+    south: Optional[float] = Query(default=None),
+    west: Optional[float] = Query(default=None),
+    north: Optional[float] = Query(default=None),
+    east: Optional[float] = Query(default=None),
+    zoom: Optional[int] = Query(default=None, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    # Сначала дешёвая версия области — если не менялась, 304 без выборки и сериализации
+    version = (await db.execute(crud.buildings_version_stmt(south=south, west=west, north=north, east=east))).one()
+    not_modified, headers = conditional(request, version.updated_at, version.count)
+    if not_modified:
+        return not_modified
+
+    # 🔵 на мелком зуме — кластеры по сетке вместо тысяч отдельных домов
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        rows = await crud.get_building_clusters_async(db, zoom, south=south, west=west, north=north, east=east)
+    else:
+        # ✅ статус и счётчик помощи считаются агрегатами в SQL, без запроса на каждый дом
+        rows = await crud.get_buildings_map_async(db, south=south, west=west, north=north, east=east)
+
+    # Accept: application/x-msgpack — колонки массивами, иначе orjson
+    return map_response(request, rows, headers)
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_buildings_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if not 0 <= z <= QUADKEY_ZOOM:
+        raise HTTPException(status_code=400, detail=f"zoom должен быть от 0 до {QUADKEY_ZOOM}")
 
-    # 🔴 RED
-    if score >= 45:
-        return "red"
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=404, detail="Tile not found")
 
-    # 🟠 ORANGE
-    if score >= 25:
-        return "orange"
+    quadkey = tile_to_quadkey(x, y, z)
 
-    # 🟡 YELLOW
-    if score >= 10:
-        return "yellow"
+    # Тайл = префикс квадключа, фиксированный URL — можно кешировать на CDN (с Vary: Accept)
+    version = (await db.execute(crud.buildings_version_stmt(quadkey=quadkey))).one()
+    not_modified, headers = conditional(request, version.updated_at, version.count, quadkey)
+    headers["Cache-Control"] = f"public, max-age={TILE_CACHE_SECONDS}"
+    if not_modified:
+        not_modified.headers["Cache-Control"] = headers["Cache-Control"]
+        return not_modified
 
-    # 🟢 ЗЕЛЁНЫЙ
-    return "green"
+    if z < CLUSTER_MAX_ZOOM:
+        rows = await crud.get_building_clusters_async(db, z, quadkey=quadkey)
+    else:
+        rows = await crud.get_buildings_map_async(db, quadkey=quadkey)
 
+    return map_response(request, rows, headers)
 
 
-@router.get("/")
-def get_buildings(
-    south: Optional[float] = Query(default=None),
-    west: Optional[float] = Query(default=None),
-    north: Optional[float] = Query(default=None),
-    east: Optional[float] = Query(default=None),
-    db: Session = Depends(get_db),
-):
-    q = db.query(Building)
-
-    # ✅ если bbox передан — фильтруем
-    if None not in (south, west, north, east):
-        q = q.filter(
-            Building.lat >= south,
-            Building.lat <= north,
-            Building.lng >= west,
-            Building.lng <= east,
-        )
+def _stream_quadkeys(tiles: str):
+    quadkeys = []
+
+    for tile in tiles.split(","):
+        try:
+            z, x, y = (int(p) for p in tile.split("/"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Тайл {tile!r}: нужен формат z/x/y")
 
-    buildings = q.all()
-    result = []
+        if not (0 <= z <= QUADKEY_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            raise HTTPException(status_code=400, detail=f"Тайл {tile!r} вне сетки")
 
-    for b in buildings:
-        reports = db.query(Report).filter(
-            Report.building_id == b.id
-        ).all()
+        quadkeys.append(tile_to_quadkey(x, y, z))
 
-        status = calculate_building_status(reports)
+    if len(quadkeys) > MAX_STREAM_TILES:
+        raise HTTPException(status_code=400, detail=f"Не больше {MAX_STREAM_TILES} тайлов")
 
-        # 🔵 ДОБАВЛЯЕМ ПОДСЧЁТ ПОМОЩИ
-        help_count = db.query(NeighborHelp).filter(
-            NeighborHelp.building_id == b.id,
-            NeighborHelp.status == "open"
-        ).count()
+    return quadkeys
 
-        result.append({
-            "id": b.id,
-            "lat": b.lat,
-            "lng": b.lng,
-            "address": getattr(b, "address", None),
-            "status": status,
-            "positive_count": getattr(b, "positive_count", 0),
-            "help_count": help_count,
-        })
 
-    return result
+@router.get("/stream")
+async def stream_buildings(
+    request: Request,
+    south: Optional[float] = Query(default=None),
+    west: Optional[float] = Query(default=None),
+    north: Optional[float] = Query(default=None),
+    east: Optional[float] = Query(default=None),
+    tiles: Optional[str] = Query(default=None),  # "z/x/y,z/x/y"
+):
+    # 📡 SSE вместо опроса GET /buildings/: приходят только изменившиеся дома в видимой области
+    bbox = (south, west, north, east) if None not in (south, west, north, east) else None
+    quadkeys = _stream_quadkeys(tiles) if tiles else None
+
+    async def events():
+        async with bus.subscribe() as sub:
+            yield "retry: 3000\n\n"
+
+            while not await request.is_disconnected():
+                event = await sub.get(SSE_HEARTBEAT_SECONDS)
+
+                if sub.lagged:
+                    # Часть событий потеряна — клиент перечитывает карту целиком
+                    sub.lagged = False
+                    yield "event: resync\ndata: {}\n\n"
+
+                if event is None:
+                    yield ": ping\n\n"
+                elif matches(event, bbox, quadkeys):
+                    yield f"event: building\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/", response_model=schemas.BuildingOut)
 def create_building(
     payload: schemas.BuildingCreate,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     b = Building(
         lat=payload.lat,
         lng=payload.lng,
+        quadkey=quadkey_for(payload.lat, payload.lng),
     )
 
     if hasattr(Building, "address") and payload.address is not None:
@@ -104,8 +162,11 @@ def create_building(
         b.status = payload.status
 
     db.add(b)
+    db.flush()
+    building_status.init_building(db, b.id)
     db.commit()
     db.refresh(b)
+    stick_to_primary(request)
     return b
 
 
@@ -113,6 +174,7 @@ def create_building(
 def update_building_position(
     building_id: int,
     payload: schemas.BuildingUpdate,
+    request: Request,
     db: Session = Depends(get_db),
 ):
     b = db.query(Building).filter(
@@ -127,30 +189,49 @@ def update_building_position(
     if payload.lng is not None:
         b.lng = payload.lng
 
+    b.quadkey = quadkey_for(b.lat, b.lng)
+    building_status.mark_changed(db, building_id)
+
     db.commit()
     db.refresh(b)
+    stick_to_primary(request)
     return b
 
     
 @router.post("/{building_id}/confirm-positive")
-def confirm_positive(building_id: int, db: Session = Depends(get_db)):
-
-    building = db.query(Building).filter(Building.id == building_id).first()
-    if not building:
-        raise HTTPException(status_code=404, detail="Building not found")
+def confirm_positive(building_id: int, request: Request, db: Session = Depends(get_db)):
+
+    now = datetime.utcnow()
+
+    # Ограничение: не чаще чем раз в 24 часа — проверка и +1 одним UPDATE
+    updated = db.execute(
+        update(Building)
+        .where(
+            Building.id == building_id,
+            or_(
+                Building.last_positive_at.is_(None),
+                Building.last_positive_at <= now - timedelta(hours=24),
+            ),
+        )
+        .values(
+            positive_count=func.coalesce(Building.positive_count, 0) + 1,
+            last_positive_at=now,
+        )
+        .returning(Building.positive_count)
+    ).first()
 
-    # Ограничение: не чаще чем раз в 24 часа
-    if building.last_positive_at:
-        if datetime.utcnow() - building.last_positive_at < timedelta(hours=24):
-            raise HTTPException(
-                status_code=400,
-                detail="Вы уже подтверждали норму за последние 24 часа"
-            )
+    if not updated:
+        if not db.query(Building.id).filter(Building.id == building_id).first():
+            raise HTTPException(status_code=404, detail="Building not found")
 
-    building.positive_count += 1
-    building.last_positive_at = datetime.utcnow()
+        raise HTTPException(
+            status_code=400,
+            detail="Вы уже подтверждали норму за последние 24 часа"
+        )
 
+    building_status.mark_changed(db, building_id)
     db.commit()
-    db.refresh(building)
+    stick_to_primary(request)
+    publish_building(db, building_id)
 
     return {"success": True}   
@@ -0,0 +1,167 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+from app.config import EXPORT_CHUNK_SIZE
+from app.database import AsyncSessionLocal
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+# =====================================================
+# ВЫГРУЗКА ДЛЯ АДМИНИСТРАЦИИ ГОРОДА
+# Серверный курсор + yield_per: в памяти одна пачка строк, а не вся таблица
+# =====================================================
+
+def _in_dates(stmt, column, date_from=None, date_to=None):
+    if date_from:
+        stmt = stmt.where(column >= datetime.combine(date_from, time.min))
+    if date_to:
+        stmt = stmt.where(column < datetime.combine(date_to + timedelta(days=1), time.min))
+    return stmt
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _rows(stmt):
+    # Своя сессия: зависимость get_async_db закрылась бы до конца стрима
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        async for chunk in result.mappings().partitions():
+            yield chunk
+
+
+async def _ndjson(stmt):
+    async for chunk in _rows(stmt):
+        yield "".join(
+            json.dumps({k: _plain(v) for k, v in row.items()}, ensure_ascii=False) + "\n"
+            for row in chunk
+        )
+
+
+async def _csv(stmt):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c.name for c in stmt.selected_columns])
+
+    async for chunk in _rows(stmt):
+        writer.writerows([_plain(v) for v in row.values()] for row in chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+    # Пустая выгрузка — всё равно с заголовком
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _stream(stmt, fmt: str, name: str):
+    body = _csv(stmt) if fmt == "csv" else _ndjson(stmt)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/reports")
+async def export_reports(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    category: Optional[schemas.ReportCategory] = Query(default=None),
+    south: Optional[float] = Query(default=None),
+    west: Optional[float] = Query(default=None),
+    north: Optional[float] = Query(default=None),
+    east: Optional[float] = Query(default=None),
+):
+    R = models.Report
+    stmt = select(
+        R.id,
+        R.building_id,
+        R.category,
+        R.severity,
+        R.periodicity,
+        R.status,
+        R.text,
+        R.created_at,
+        R.problem_count.label("problem_confirmations"),
+        R.resolved_count.label("resolved_confirmations"),
+        R.image_path,
+    ).order_by(R.id)
+
+    stmt = _in_dates(stmt, R.created_at, date_from, date_to)
+
+    if category:
+        stmt = stmt.where(R.category == category.value)
+
+    if None not in (south, west, north, east):
+        stmt = crud.in_area(
+            stmt.join(models.Building, models.Building.id == R.building_id),
+            south=south, west=west, north=north, east=east,
+        )
+
+    return _stream(stmt, format, "reports")
+
+
+@router.get("/buildings")
+async def export_buildings(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[date] = Query(default=None),
+    date_to: Optional[date] = Query(default=None),
+    category: Optional[schemas.ReportCategory] = Query(default=None),
+    south: Optional[float] = Query(default=None),
+    west: Optional[float] = Query(default=None),
+    north: Optional[float] = Query(default=None),
+    east: Optional[float] = Query(default=None),
+):
+    B = models.Building
+    S = models.BuildingStatus
+    stmt = (
+        select(
+            B.id,
+            B.lat,
+            B.lng,
+            B.address,
+            func.coalesce(S.status, "green").label("status"),
+            func.coalesce(S.score, 0).label("score"),
+            B.report_count,
+            func.coalesce(S.help_count, 0).label("help_count"),
+            B.positive_count,
+            B.created_at,
+            S.last_activity_at,
+        )
+        .outerjoin(S, S.building_id == B.id)
+        .order_by(B.id)
+    )
+
+    # Даты — по созданию дома
+    stmt = _in_dates(stmt, B.created_at, date_from, date_to)
+
+    # Категория — дома, на которые есть жалобы этой категории
+    if category:
+        stmt = stmt.where(
+            select(models.Report.id)
+            .where(models.Report.building_id == B.id, models.Report.category == category.value)
+            .exists()
+        )
+
+    stmt = crud.in_area(stmt, south=south, west=west, north=north, east=east)
+
+    return _stream(stmt, format, "buildings")
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 import hashlib
 from datetime import datetime
 from app.models import HelpResponse
-from app.models import NeighborHelp
 
-from app import models, schemas
-from app.database import get_db
+from app import building_status, models, schemas
+from app.cache import conditional
+from app.database import dialect_insert, get_db
+from app.events import publish_building
+from app.pagination import PageParams, keyset, page_response, split_page
+from app.replicas import get_async_read_db, stick_to_primary
 
 router = APIRouter(prefix="/help", tags=["neighbor_help"])
 
@@ -18,10 +23,9 @@ def create_help(payload: schemas.NeighborHelpCreate, request: Request, db: Sessi
     raw = f"{ip}-{payload.building_id}"
     user_hash = hashlib.sha256(raw.encode()).hexdigest()
 
-    active_count = db.query(NeighborHelp).filter(
-        NeighborHelp.building_id == payload.building_id,
-        NeighborHelp.status == "open"
-    ).count()
+    # Счётчик открытых заявок уже ведётся в проекции building_status
+    status = db.get(models.BuildingStatus, payload.building_id)
+    active_count = status.help_count if status else 0
 
     if active_count >= 3:
         raise HTTPException(
@@ -39,31 +43,64 @@ def create_help(payload: schemas.NeighborHelpCreate, request: Request, db: Sessi
     )
 
     db.add(help_item)
+    building_status.apply_help_delta(db, payload.building_id, +1)
     db.commit()
     db.refresh(help_item)
+    stick_to_primary(request)
+    publish_building(db, payload.building_id)
 
     return help_item
 
 
 @router.get("/", response_model=List[schemas.NeighborHelpOut])
-def get_help(building_id: int = None, db: Session = Depends(get_db)):
-    query = db.query(models.NeighborHelp)
+async def get_help(
+    request: Request,
+    response: Response,
+    building_id: int = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    page.check_fields(schemas.NeighborHelpOut)
+
+    # Создание/закрытие заявки поднимает building_status.updated_at дома
+    version = select(func.max(models.BuildingStatus.updated_at))
+    if building_id:
+        version = version.where(models.BuildingStatus.building_id == building_id)
+
+    not_modified, headers = conditional(request, await db.scalar(version))
+    if not_modified:
+        return not_modified
+
+    query = select(models.NeighborHelp)
 
     if building_id:
-        query = query.filter(models.NeighborHelp.building_id == building_id)
+        query = query.where(models.NeighborHelp.building_id == building_id)
+
+    if page.fields is not None:
+        query = query.options(page.load_only(models.NeighborHelp))
 
-    return query.order_by(models.NeighborHelp.id.desc()).all()
+    result = await db.execute(keyset(query, models.NeighborHelp.id, page))
+    items, next_cursor = split_page(result.scalars().all(), page)
+    return page_response(items, next_cursor, page, response, headers)
 
 
 @router.post("/{help_id}/close")
-def close_help(help_id: int, db: Session = Depends(get_db)):
+def close_help(help_id: int, request: Request, db: Session = Depends(get_db)):
     item = db.query(models.NeighborHelp).filter(models.NeighborHelp.id == help_id).first()
 
     if not item:
         raise HTTPException(status_code=404, detail="Not found")
 
+    was_open = item.status == "open"
+    if was_open:
+        building_status.apply_help_delta(db, item.building_id, -1)
+
     item.status = "closed"
     db.commit()
+    stick_to_primary(request)
+
+    if was_open:
+        publish_building(db, item.building_id)
 
     return {"status": "closed"}
     
@@ -75,20 +112,17 @@ def respond_to_help(help_id: int, request: Request, db: Session = Depends(get_db
     if not user_hash:
         raise HTTPException(status_code=400, detail="No user hash")
 
-    existing = db.query(HelpResponse).filter(
-        HelpResponse.help_id == help_id,
-        HelpResponse.responder_hash == user_hash
+    # Повторный отклик отсекает уникальный индекс (help_id, responder_hash)
+    inserted = db.execute(
+        dialect_insert(db, HelpResponse)
+        .values(help_id=help_id, responder_hash=user_hash)
+        .on_conflict_do_nothing(index_elements=["help_id", "responder_hash"])
+        .returning(HelpResponse.id)
     ).first()
 
-    if existing:
+    if not inserted:
         return {"message": "already responded"}
 
-    response = HelpResponse(
-        help_id=help_id,
-        responder_hash=user_hash
-    )
-
-    db.add(response)
     db.commit()
 
     return {"message": "ok"}
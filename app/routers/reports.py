@@ -1,19 +1,41 @@
+import logging
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy import select, update
 import hashlib
 
-from app import models, schemas
-from app.database import get_db
-from datetime import datetime, timedelta
+from app import building_status, crud, models, rollups, schemas
+from app.cache import bump_analytics, conditional
+from app.events import publish_building
+from app.database import dialect_insert, get_db
+from app.pagination import PageParams, keyset, page_response, split_page
+from app.ratelimit import RateLimit, limiter
+from app.replicas import get_async_read_db, stick_to_primary
+from app.images import schedule_variants
+from app.uploads import stage_upload
 
 from fastapi import UploadFile, File, Form
-import os
-import uuid
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+logger = logging.getLogger(__name__)
+
+# Максимум 3 жалобы в сутки с одного IP (в целом)
+REPORT_DAILY_LIMIT = RateLimit(
+    "report-daily", 3, 24 * 3600, 429, "Слишком много жалоб за сутки с вашего IP"
+)
+# 1 жалоба на дом в 24 часа
+REPORT_BUILDING_LIMIT = RateLimit(
+    "report-building", 1, 24 * 3600, 400, "Вы уже оставляли жалобу за последние 24 часа"
+)
+# Антифлуд (60 секунд)
+REPORT_FLOOD_LIMIT = RateLimit(
+    "report-flood", 1, 60, 429, "Слишком часто. Подождите минуту."
+)
+
 
 @router.post("/", response_model=schemas.ReportOut)
 def create_report(
@@ -26,156 +48,160 @@ def create_report(
     image: UploadFile = File(None),
     db: Session = Depends(get_db),
 ):
-    b = db.query(models.Building).filter(
-        models.Building.id == building_id
-    ).first()
-
-    if not b:
-        raise HTTPException(status_code=404, detail="Building not found")
-
     # простой user_hash (анонимно, стабильно)
     ip = request.client.host
     raw = f"{ip}-{building_id}"
     user_hash = hashlib.sha256(raw.encode()).hexdigest()
 
-    # Проверка 1 жалоба в 24 часа
-    since = datetime.utcnow() - timedelta(hours=24)
-    
-    # Дополнительный лимит: максимум 3 жалобы в сутки с одного IP (в целом)
-    daily_count = db.query(models.Report).filter(
-        models.Report.user_hash == user_hash,
-        models.Report.created_at >= since
-    ).count()
-
-    if daily_count >= 3:
-        raise HTTPException(
-            status_code=429,
-            detail="Слишком много жалоб за сутки с вашего IP"
+    # Лимиты в памяти/Redis — спам отсекается до диска и БД
+    limits = [
+        (REPORT_DAILY_LIMIT, user_hash),
+        (REPORT_BUILDING_LIMIT, f"{building_id}:{user_hash}"),
+        (REPORT_FLOOD_LIMIT, user_hash),
+    ]
+    reservation = limiter.acquire(*limits)
+    staged = None
+
+    try:
+        # Картинку принимаем до запросов в БД — соединение не держится, пока файл пишется на диск
+        staged = stage_upload(image) if image else None
+
+        b = db.query(models.Building).filter(
+            models.Building.id == building_id
+        ).first()
+
+        if not b:
+            raise HTTPException(status_code=404, detail="Building not found")
+
+        report = models.Report(
+            building_id=building_id,
+            category=category,
+            text=text,
+            severity=severity,
+            periodicity=periodicity,  # ✅ ВАЖНО
+            user_hash=user_hash,              # ✅ ВАЖНО
+            image_path=staged.url if staged else None  # ← ДОБАВЛЕНО
         )
-    
-    existing = db.query(models.Report).filter(
-        models.Report.building_id == building_id,
-        models.Report.user_hash == user_hash,
-        models.Report.created_at >= since
-    ).first()
 
-    if existing:
-        raise HTTPException(
-            status_code=400,
-            detail="Вы уже оставляли жалобу за последние 24 часа"
-        )
-    
-    # Проверка антифлуда (60 секунд)
-    last_report = db.query(models.Report).filter(
-        models.Report.user_hash == user_hash
-    ).order_by(models.Report.created_at.desc()).first()
-
-    if last_report:
-        delta = datetime.utcnow() - last_report.created_at
-        if delta.total_seconds() < 60:
-            raise HTTPException(
-                status_code=429,
-                detail="Слишком часто. Подождите минуту."
-            )
-    
-    image_path = None
-
-    if image:
-        if image.content_type not in ["image/jpeg", "image/png", "image/webp"]:
-            raise HTTPException(status_code=400, detail="Разрешены только изображения")
-
-        contents = image.file.read()
-        if len(contents) > 5 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="Файл слишком большой (макс 5MB)")
-
-        image.file.seek(0)
-        
-        os.makedirs("uploads", exist_ok=True)
-
-        ext = image.filename.split(".")[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
-        file_location = os.path.join("uploads", filename)
-
-        with open(file_location, "wb") as f:
-            f.write(image.file.read())
-
-        image_path = f"/uploads/{filename}"
-    
-    report = models.Report(
-        building_id=building_id,
-        category=category,
-        text=text,
-        severity=severity,
-        periodicity=periodicity,  # ✅ ВАЖНО
-        user_hash=user_hash,              # ✅ ВАЖНО
-        image_path=image_path  # ← ДОБАВЛЕНО
-    )
+        db.add(report)
+        building_status.apply_report_created(db, building_id, severity)
+        rollups.apply_report_created(db, report)
+        crud.increment_report_count(db, building_id)
+        db.commit()
+    except BaseException:
+        limiter.release(reservation)
+        if staged:
+            staged.discard()
+        raise
+
+    # В хранилище — только после commit: при сбое вставки объект не остался бы без жалобы
+    if staged:
+        try:
+            staged.publish()
+        except Exception:
+            logger.exception("image publish failed for report %s", report.id)
+            staged.discard()
+            staged = None
+            report.image_path = None
+            db.commit()
 
-    db.add(report)
-    db.commit()
     db.refresh(report)
 
-    return report
+    bump_analytics()
+    stick_to_primary(request)  # автор сразу видит свою жалобу, даже если реплика отстаёт
+    publish_building(db, building_id)
 
+    # Превью — в фоне, ответ их не ждёт
+    if staged:
+        schedule_variants(staged.key)
 
-@router.get("/buildings/{building_id}/reports", response_model=List[schemas.ReportOut])
-def get_reports_by_building(building_id: int, db: Session = Depends(get_db)):
+    return report
 
-    reports = db.query(models.Report).filter(
-        models.Report.building_id == building_id
-    ).order_by(models.Report.id.desc()).all()
 
-    now = datetime.utcnow()
+@router.get("/buildings/{building_id}/reports", response_model=List[schemas.ReportOut])
+async def get_reports_by_building(
+    building_id: int,
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    page.check_fields(schemas.ReportOut)
 
+    # Любое изменение жалоб дома поднимает building_status.updated_at — это и есть версия
+    last_changed = await db.scalar(
+        select(models.BuildingStatus.updated_at).where(models.BuildingStatus.building_id == building_id)
+    )
+    not_modified, headers = conditional(request, last_changed, building_id)
+    if not_modified:
+        return not_modified
+
+    # Счётчики подтверждений хранятся в самой жалобе (problem_count / resolved_count)
+    stmt = select(models.Report).where(models.Report.building_id == building_id)
+
+    if page.fields is not None:
+        # image_path и счётчики нужны для вычисляемых полей
+        stmt = stmt.options(page.load_only(
+            models.Report,
+            models.Report.image_path,
+            models.Report.image_variants_ready,
+            models.Report.problem_count,
+            models.Report.resolved_count,
+        ))
+
+    result = await db.execute(keyset(stmt, models.Report.id, page))
+    reports, next_cursor = split_page(result.scalars().all(), page)
+
+    # Устаревание жалоб делает фоновый sweeper (app/sweeper.py) — GET только читает
     for report in reports:
-        # Авто-устаревание только для open
-        if report.status == "open":
-            if now - report.created_at > timedelta(days=30):
-                report.status = "outdated"
+        report.problem_confirmations = report.problem_count
+        report.resolved_confirmations = report.resolved_count
+        report.confirmations = report.problem_count + report.resolved_count
 
-    db.commit()
+    return page_response(reports, next_cursor, page, response, headers)
 
-    for report in reports:
-        confirmations_count = db.query(models.ReportConfirmation).filter(
-            models.ReportConfirmation.report_id == report.id
-        ).count()
 
-        report.confirmations = confirmations_count
-    
-    for report in reports:
-        problem_count = db.query(models.ReportConfirmation).filter(
-            models.ReportConfirmation.report_id == report.id,
-            models.ReportConfirmation.type == "problem"
-        ).count()
+def _add_confirmation(db: Session, report_id: int, user_hash: str, kind: str) -> bool:
+    # Дубликат отсекает уникальный индекс — один INSERT вместо SELECT + INSERT
+    RC = models.ReportConfirmation
+    inserted = db.execute(
+        dialect_insert(db, RC)
+        .values(report_id=report_id, user_hash=user_hash, type=kind)
+        .on_conflict_do_nothing(index_elements=["report_id", "user_hash", "type"])
+        .returning(RC.id)
+    ).first()
 
-        resolved_count = db.query(models.ReportConfirmation).filter(
-            models.ReportConfirmation.report_id == report.id,
-            models.ReportConfirmation.type == "resolved"
-        ).count()
+    return inserted is not None
 
-        report.problem_confirmations = problem_count
-        report.resolved_confirmations = resolved_count
-    
-    now = datetime.utcnow()
 
-    for report in reports:
-        if report.status == "open":
-            # Последнее подтверждение проблемы
-            last_problem_confirm = db.query(models.ReportConfirmation).filter(
-                models.ReportConfirmation.report_id == report.id,
-                models.ReportConfirmation.type == "problem"
-            ).order_by(models.ReportConfirmation.created_at.desc()).first()
+def _increment(db: Session, report_id: int, column) -> int:
+    # UPDATE ... SET x = x + 1 RETURNING x — без гонок и без пересчёта подтверждений
+    return db.execute(
+        update(models.Report)
+        .where(models.Report.id == report_id)
+        .values({column: column + 1})
+        .returning(column)
+    ).scalar_one()
 
-            last_activity = report.created_at
 
-            if last_problem_confirm:
-                last_activity = last_problem_confirm.created_at
+def _escalate(db: Session, report, old: str, new: str) -> bool:
+    # Условный UPDATE: поднимет серьёзность только один из конкурентных запросов
+    escalated = db.execute(
+        update(models.Report)
+        .where(
+            models.Report.id == report.id,
+            models.Report.status == "open",
+            models.Report.severity == old,
+        )
+        .values(severity=new)
+        .returning(models.Report.id)
+    ).first()
+
+    if escalated:
+        building_status.apply_severity_change(db, report.building_id, old, new)
+        rollups.apply_severity_change(db, report, old, new)
 
-            if now - last_activity > timedelta(days=30):
-                report.status = "outdated"
-                db.commit()
-    
-    return reports
+    return bool(escalated)
 
 
 @router.post("/{report_id}/confirm-problem")
@@ -188,37 +214,25 @@ def confirm_problem(report_id: int, request: Request, db: Session = Depends(get_
     ip = request.client.host
     user_hash = hashlib.sha256(f"{ip}-{report.building_id}".encode()).hexdigest()
 
-    existing = db.query(models.ReportConfirmation).filter(
-        models.ReportConfirmation.report_id == report_id,
-        models.ReportConfirmation.user_hash == user_hash,
-        models.ReportConfirmation.type == "problem"
-    ).first()
-
-    if existing:
+    if not _add_confirmation(db, report_id, user_hash, "problem"):
         raise HTTPException(status_code=400, detail="Вы уже подтверждали проблему")
 
-    confirmation = models.ReportConfirmation(
-        report_id=report_id,
-        user_hash=user_hash,
-        type="problem"
-    )
+    count = _increment(db, report_id, models.Report.problem_count)
+    building_status.touch(db, report.building_id)
+
+    # Авто-поднятие серьёзности — по значению счётчика из RETURNING
+    escalated = None
+    if count >= 5:
+        escalated = _escalate(db, report, "medium", "high")
+    if not escalated and count >= 3:
+        escalated = _escalate(db, report, "low", "medium")
 
-    db.add(confirmation)
     db.commit()
+    stick_to_primary(request)
 
-    count = db.query(models.ReportConfirmation).filter(
-        models.ReportConfirmation.report_id == report_id,
-        models.ReportConfirmation.type == "problem"
-    ).count()
-    
-    # Авто-поднятие серьёзности
-    if report.status == "open":
-        if count >= 5 and report.severity == "medium":
-            report.severity = "high"
-            db.commit()
-        elif count >= 3 and report.severity == "low":
-            report.severity = "medium"
-            db.commit()
+    if escalated:
+        bump_analytics()
+        publish_building(db, report.building_id)
 
     return {"confirmations": count}
 
@@ -235,32 +249,27 @@ def confirm_resolved(report_id: int, request: Request, db: Session = Depends(get
     ip = request.client.host
     user_hash = hashlib.sha256(f"{ip}-{report.building_id}".encode()).hexdigest()
 
-    existing = db.query(models.ReportConfirmation).filter(
-        models.ReportConfirmation.report_id == report_id,
-        models.ReportConfirmation.user_hash == user_hash,
-        models.ReportConfirmation.type == "resolved"
-    ).first()
-
-    if existing:
+    if not _add_confirmation(db, report_id, user_hash, "resolved"):
         raise HTTPException(status_code=400, detail="Вы уже подтверждали решение")
 
-    confirmation = models.ReportConfirmation(
-        report_id=report_id,
-        user_hash=user_hash,
-        type="resolved"
-    )
+    count = _increment(db, report_id, models.Report.resolved_count)
+    building_status.touch(db, report.building_id)
 
-    db.add(confirmation)
-    db.commit()
+    resolved = None
+    if count >= 3:
+        resolved = db.execute(
+            update(models.Report)
+            .where(models.Report.id == report_id, models.Report.status == "open")
+            .values(status="resolved")
+            .returning(models.Report.id)
+        ).first()
 
-    count = db.query(models.ReportConfirmation).filter(
-        models.ReportConfirmation.report_id == report_id,
-        models.ReportConfirmation.type == "resolved"
-    ).count()
+    db.commit()
+    stick_to_primary(request)
 
-    if count >= 3:
-        report.status = "resolved"
-        db.commit()
+    if resolved:
+        bump_analytics()
+        publish_building(db, report.building_id)
 
     return {
         "confirmations": count,
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -88,6 +88,7 @@ class ReportOut(BaseModel):
     problem_confirmations: int = 0
     resolved_confirmations: int = 0
     image_path: Optional[str] = None  # ← НОВОЕ ПОЛЕ
+    image_variants: Optional[Dict[str, str]] = None  # ширина -> URL превью WebP
 
     class Config:
         from_attributes = True
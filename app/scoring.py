@@ -0,0 +1,43 @@
+from sqlalchemy import case
+
+from app.models import Report
+
+# Вес жалобы в "оценке" дома по серьёзности
+SEVERITY_WEIGHTS = {
+    "high": 3,
+    "medium": 1,
+    "low": 0,
+}
+
+# Пороги цвета дома (от худшего к лучшему)
+STATUS_THRESHOLDS = [
+    (45, "red"),
+    (25, "orange"),
+    (10, "yellow"),
+]
+
+
+def status_from_score(score: int) -> str:
+    for threshold, color in STATUS_THRESHOLDS:
+        if score >= threshold:
+            return color
+
+    return "green"
+
+
+# То же самое, но в SQL — чтобы суммировать вес прямо в GROUP BY
+severity_weight_expr = case(
+    *[
+        (Report.severity == severity, weight)
+        for severity, weight in SEVERITY_WEIGHTS.items()
+        if weight
+    ],
+    else_=0,
+)
+
+
+def status_case(score_expr):
+    return case(
+        *[(score_expr >= threshold, color) for threshold, color in STATUS_THRESHOLDS],
+        else_="green",
+    )
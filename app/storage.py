@@ -0,0 +1,127 @@
+import io
+import os
+from abc import ABC, abstractmethod
+
+from fastapi.staticfiles import StaticFiles
+
+from app.config import S3_BUCKET, S3_ENDPOINT_URL, S3_PUBLIC_URL, STORAGE_BACKEND, UPLOAD_DIR
+
+# Ключ = sha256 содержимого, значит файл по ключу никогда не меняется
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def content_key(digest: str, ext: str) -> str:
+    # ab/cd/abcd...ef.jpg — раскладываем по подпапкам, чтобы каталоги не разрастались
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+class Storage(ABC):
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put_file(self, src_path: str, key: str, content_type: str):
+        # Забирает src_path себе (переносит или загружает и удаляет)
+        ...
+
+    @abstractmethod
+    def open(self, key: str):
+        ...
+
+    @abstractmethod
+    def keys(self):
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+
+class LocalStorage(Storage):
+    def __init__(self, root: str, base_url: str = "/uploads"):
+        self.root = root
+        self.base_url = base_url
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put_file(self, src_path, key, content_type):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+
+    def open(self, key):
+        return open(self._path(key), "rb")
+
+    def keys(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            rel = os.path.relpath(dirpath, self.root)
+            for name in filenames:
+                yield name if rel == "." else f"{rel.replace(os.sep, '/')}/{name}"
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+class S3Storage(Storage):
+    def __init__(self, bucket: str, endpoint_url: str = None, public_url: str = None):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.public_url = (public_url or f"{endpoint_url or 'https://s3.amazonaws.com'}/{bucket}").rstrip("/")
+        self._client_error = ClientError
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, src_path, key, content_type):
+        self.client.upload_file(
+            src_path,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+        )
+        os.remove(src_path)
+
+    def open(self, key):
+        obj = self.client.get_object(Bucket=self.bucket, Key=key)
+        return io.BytesIO(obj["Body"].read())
+
+    def keys(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def url(self, key):
+        return f"{self.public_url}/{key}"
+
+
+class ImmutableStaticFiles(StaticFiles):
+    # ETag/Last-Modified и 304 StaticFiles уже умеет; добавляем долгий кеш
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def _create_storage() -> Storage:
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, endpoint_url=S3_ENDPOINT_URL, public_url=S3_PUBLIC_URL)
+
+    return LocalStorage(UPLOAD_DIR)
+
+
+storage = _create_storage()
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache import bump_analytics
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Жалоба без подтверждений проблемы дольше этого срока считается устаревшей
+REPORT_TTL = timedelta(days=30)
+
+
+def outdate_stale_reports(db: Session, now=None) -> int:
+    now = now or datetime.utcnow()
+    cutoff = now - REPORT_TTL
+
+    RC = models.ReportConfirmation
+
+    last_problem = (
+        select(func.max(RC.created_at))
+        .where(RC.report_id == models.Report.id, RC.type == "problem")
+        .scalar_subquery()
+    )
+    last_activity = func.coalesce(last_problem, models.Report.created_at)
+
+    stale = (
+        models.Report.status == "open",
+        models.Report.created_at < cutoff,  # дешёвый отсев по индексу
+        last_activity < cutoff,
+    )
+
+    # Статус дома не меняется, но его данные изменились
+    db.query(models.BuildingStatus).filter(
+        models.BuildingStatus.building_id.in_(
+            select(models.Report.building_id).where(*stale).distinct()
+        )
+    ).update({models.BuildingStatus.updated_at: now}, synchronize_session=False)
+
+    count = db.query(models.Report).filter(*stale).update(
+        {models.Report.status: "outdated"}, synchronize_session=False
+    )
+
+    db.commit()
+
+    if count:
+        bump_analytics()
+
+    return count
+
+
+def sweep_once() -> int:
+    with SessionLocal() as db:
+        return outdate_stale_reports(db)
+
+
+async def run_sweeper(interval: int):
+    while True:
+        try:
+            count = await asyncio.to_thread(sweep_once)
+            if count:
+                logger.info("outdated %s reports", count)
+        except Exception:
+            logger.exception("report sweeper failed")
+
+        await asyncio.sleep(interval)
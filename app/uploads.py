@@ -0,0 +1,182 @@
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from PIL import Image, UnidentifiedImageError
+
+from app.config import IMAGE_MAX_PIXELS, UPLOAD_DIR
+from app.storage import content_key, storage
+
+TMP_DIR = UPLOAD_DIR + ".tmp"  # рядом с uploads/, но не раздаётся StaticFiles; rename атомарный
+
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Тело multipart целиком: картинка + текстовые поля и границы частей
+MAX_UPLOAD_BODY = MAX_IMAGE_SIZE + 256 * 1024
+UPLOAD_ROUTES = {("POST", "/reports/")}
+
+# Ширины превью (WebP), генерируются в app/images.py
+VARIANT_WIDTHS = (320, 640, 1280)
+
+
+def variant_path(path: str, width: int) -> str:
+    # /uploads/ab/cd/abcd.png -> /uploads/ab/cd/abcd_w320.webp (и так же для ключа в хранилище)
+    stem, _ = os.path.splitext(path)
+    return f"{stem}_w{width}.webp"
+
+
+def image_variants(image_path):
+    if not image_path:
+        return None
+
+    return {str(w): variant_path(image_path, w) for w in VARIANT_WIDTHS}
+
+
+def sniff_image(head: bytes):
+    # Тип определяем по сигнатуре файла, а не по content_type от клиента
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def check_pixels(path: str):
+    # Image.open читает только заголовок — размер узнаём, не декодируя картинку
+    too_large = HTTPException(status_code=400, detail="Слишком большое разрешение картинки")
+
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        raise too_large
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="Разрешены только изображения")
+
+    if width * height > IMAGE_MAX_PIXELS:
+        raise too_large
+
+
+class StagedUpload:
+    def __init__(self, tmp_path: str, ext: str, size: int, digest: str):
+        self.tmp_path = tmp_path
+        self.ext = ext
+        self.size = size
+        self.key = content_key(digest, ext)
+        self.url = storage.url(self.key)  # известен до публикации — пишется в жалобу до commit
+
+    def publish(self) -> str:
+        # Та же картинка уже есть — второй раз не храним
+        if storage.exists(self.key):
+            os.remove(self.tmp_path)
+        else:
+            storage.put_file(self.tmp_path, self.key, CONTENT_TYPES[self.ext])
+
+        return self.url
+
+    def discard(self):
+        # Опубликованный файл не трогаем: по этому ключу могут ссылаться другие жалобы
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def stage_upload(upload) -> StagedUpload:
+    # Пишем кусками во временный файл: в памяти один чанк, лимит — сразу при превышении.
+    # Тело запроса к этому моменту FastAPI уже разобрал (и сбросил на диск) —
+    # огромные запросы обрывает раньше UploadLimitMiddleware.
+    # Вызывается из sync-роута, т.е. в threadpool, а не в event loop
+    os.makedirs(TMP_DIR, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_DIR)
+    size = 0
+    ext = None
+    digest = hashlib.sha256()
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = upload.file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if ext is None:
+                    ext = sniff_image(chunk[:16])
+                    if ext is None:
+                        raise HTTPException(status_code=400, detail="Разрешены только изображения")
+
+                size += len(chunk)
+                if size > MAX_IMAGE_SIZE:
+                    raise HTTPException(status_code=400, detail="Файл слишком большой (макс 5MB)")
+
+                out.write(chunk)
+                digest.update(chunk)
+
+        if ext is None:
+            raise HTTPException(status_code=400, detail="Разрешены только изображения")
+
+        check_pixels(tmp_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return StagedUpload(tmp_path, ext, size, digest.hexdigest())
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    # До разбора multipart: отказ по Content-Length, а без него — по счётчику
+    # принятых байт, чтобы 500 МБ не дочитывались и не писались на диск
+    def __init__(self, app, max_body: int = MAX_UPLOAD_BODY):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in UPLOAD_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = JSONResponse({"detail": "Файл слишком большой (макс 5MB)"}, status_code=413)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_body:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    exceeded = True
+                    raise _BodyTooLarge()  # FastAPI превратит это в 400 — ответ подменяем ниже
+            return message
+
+        async def limited_send(message):
+            nonlocal started
+            if not exceeded:
+                started = started or message["type"] == "http.response.start"
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            pass
+
+        if exceeded and not started:
+            await too_large(scope, receive, send)
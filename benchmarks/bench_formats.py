@@ -0,0 +1,89 @@
+"""Размер и время кодирования ответа карты: jsonable_encoder + json (как было),
+orjson (ORJSONResponse) и msgpack с колонками-массивами.
+
+    python -m benchmarks.bench_formats --sizes 10000 100000
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+
+import msgpack
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app.formats import STATUS_CODES, columnar
+
+
+def fake_rows(n: int, seed: int = 1):
+    # Та же форма, что у crud.buildings_map_rows
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "lat": 55.55 + rnd.random() * 0.4,
+            "lng": 37.35 + rnd.random() * 0.5,
+            "address": f"ул. Синтетическая, {i}",
+            "status": rnd.choices(STATUS_CODES, weights=[80, 12, 5, 3])[0],
+            "positive_count": rnd.randint(0, 20),
+            "help_count": rnd.randint(0, 3),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def fastapi_default(rows):
+    # JSONResponse по умолчанию: jsonable_encoder обходит каждое значение, потом json.dumps
+    return json.dumps(
+        jsonable_encoder(rows), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+ENCODERS = [
+    ("json (default)", fastapi_default),
+    ("orjson", orjson.dumps),
+    ("msgpack cols", lambda rows: msgpack.packb(columnar(rows))),
+]
+
+
+def measure(fn, rows, repeat):
+    timings = []
+    body = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(rows)
+        timings.append(time.perf_counter() - start)
+
+    return body, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        rows = fake_rows(n)
+        print(f"\n{n} buildings")
+        print(f"{'format':<16}{'encode, ms':>12}{'bytes':>12}{'gzip bytes':>12}")
+
+        baseline = None
+        for name, fn in ENCODERS:
+            body, t = measure(fn, rows, args.repeat)
+            zipped = len(gzip.compress(body, 6))
+
+            if baseline is None:
+                baseline = t
+
+            print(f"{name:<16}{t * 1000:>12.1f}{len(body):>12}{zipped:>12}   x{baseline / t:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Сравнение старого цикла GET /buildings/ (N+1), агрегатов в SQL и проекции building_status.
+
+    python -m benchmarks.bench_map --buildings 20000
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import building_status, crud
+from app.models import Building, Report, NeighborHelp
+from app.routers.buildings import calculate_building_status
+from app.scoring import status_from_score
+from benchmarks.seed import seed_city
+
+
+def legacy_get_buildings(db):
+    # Старый вариант: два запроса на каждый дом
+    result = []
+
+    for b in db.query(Building).all():
+        reports = db.query(Report).filter(Report.building_id == b.id).all()
+        help_count = db.query(NeighborHelp).filter(
+            NeighborHelp.building_id == b.id,
+            NeighborHelp.status == "open"
+        ).count()
+
+        result.append({
+            "id": b.id,
+            "lat": b.lat,
+            "lng": b.lng,
+            "address": b.address,
+            "status": calculate_building_status(reports),
+            "positive_count": b.positive_count,
+            "help_count": help_count,
+        })
+
+    return result
+
+
+def aggregated_get_buildings(db):
+    # Агрегаты по reports/neighbor_help на каждый запрос, без проекции
+    rows = {r.building_id: r for r in building_status.aggregate_query(db).all()}
+    return [
+        {
+            "id": b.id,
+            "lat": b.lat,
+            "lng": b.lng,
+            "address": b.address,
+            "status": status_from_score(rows[b.id].score),
+            "positive_count": b.positive_count,
+            "help_count": rows[b.id].help_count,
+        }
+        for b in db.query(Building).all()
+    ]
+
+
+def measure(Session, fn, repeat):
+    timings = []
+    queries = 0
+    result = None
+
+    for _ in range(repeat):
+        with Session() as db:
+            counter = {"n": 0}
+
+            def _count(*args):
+                counter["n"] += 1
+
+            event.listen(db.get_bind(), "before_cursor_execute", _count)
+            start = time.perf_counter()
+            result = fn(db)
+            timings.append(time.perf_counter() - start)
+            event.remove(db.get_bind(), "before_cursor_execute", _count)
+            queries = counter["n"]
+
+    return result, statistics.median(timings), queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="sqlite:///bench_map.db")
+    parser.add_argument("--buildings", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--force", action="store_true", help="разрешить засев базы без 'bench' в имени")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db)
+    if not args.no_seed:
+        print("seed:", seed_city(engine, args.buildings, force=args.force))
+
+    Session = sessionmaker(bind=engine)
+
+    variants = [
+        ("legacy", legacy_get_buildings),
+        ("aggregated", aggregated_get_buildings),
+        ("projection", crud.get_buildings_map),
+    ]
+
+    key = lambda r: r["id"]
+    baseline = None
+
+    print(f"{'variant':<12}{'median, s':>12}{'queries':>10}")
+
+    for name, fn in variants:
+        result, t, q = measure(Session, fn, args.repeat)
+        result = sorted(result, key=key)
+
+        if baseline is None:
+            baseline = (result, t)
+        assert result == baseline[0], f"{name}: ответ отличается от legacy"
+
+        print(f"{name:<12}{t:>12.3f}{q:>10}   x{baseline[1] / t:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Бенчмарк всех роутов buildings / reports / neighbor_help / analytics.
+
+Сидит синтетический город (benchmarks/seed.py), гоняет каждый роут через
+ASGI-приложение в процессе (без сети и uvicorn), считает p50/p95/p99 и число
+SQL-запросов (заголовок X-DB-Queries), сохраняет JSON для сравнения.
+
+    python -m benchmarks.bench_routes --buildings 20000 --out before.json
+    python -m benchmarks.bench_routes --no-seed --out after.json --compare before.json
+    python -m benchmarks.bench_routes --db postgresql://localhost/cityhelp_bench
+
+База — только из --db (по умолчанию отдельный sqlite:///bench_routes.db),
+DATABASE_URL окружения игнорируется: засев делает drop_all. Базу без
+"bench" в имени засеять можно только с --force.
+
+/buildings/stream (SSE, долгое соединение) сюда не входит.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_DB = "sqlite:///bench_routes.db"
+
+
+def _db_arg() -> str:
+    # --db нужен до импорта app: движок приложения создаётся из DATABASE_URL при импорте
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--db", default=DEFAULT_DB)
+    return pre.parse_known_args()[0].db
+
+
+os.environ["DATABASE_URL"] = _db_arg()
+os.environ["DB_QUERY_HEADER"] = "1"
+os.environ["METRICS_ENABLED"] = "1"
+
+import httpx
+from sqlalchemy import create_engine
+
+from app.geo import lat_lng_to_tile
+from app.main import app
+from benchmarks.seed import CITY_CENTER, seed_city
+
+# Окно ~5x5 км в центре города — как в load_test.py
+BBOX = {"south": 55.73, "west": 37.59, "north": 55.77, "east": 37.65}
+CITY = {"south": 55.6, "west": 37.4, "north": 55.9, "east": 37.85}
+
+
+class Route:
+    def __init__(self, name: str, method: str, build, write: bool = False):
+        self.name = name
+        self.method = method
+        self.build = build  # (ctx, i) -> (path, kwargs для httpx)
+        self.write = write  # пишущие роуты — с новым IP на каждый запрос (лимиты, уникальность)
+
+
+def _tile(z):
+    x, y = lat_lng_to_tile(*CITY_CENTER, z)
+    return f"/buildings/tiles/{z}/{x}/{y}"
+
+
+def _report_form(ctx, i):
+    return "/reports/", {"data": {
+        "building_id": ctx["buildings"] - i % ctx["buildings"],
+        "category": "road",
+        "severity": "medium",
+        "periodicity": "often",
+        "text": "Бенчмарк: яма на дороге",
+    }}
+
+
+ROUTES = [
+    # --- чтение ---
+    Route("GET /buildings/ bbox", "GET", lambda c, i: ("/buildings/", {"params": BBOX})),
+    Route("GET /buildings/ city zoom=11", "GET", lambda c, i: ("/buildings/", {"params": {**CITY, "zoom": 11}})),
+    Route("GET /buildings/ bbox msgpack", "GET", lambda c, i: (
+        "/buildings/", {"params": BBOX, "headers": {"Accept": "application/x-msgpack"}})),
+    Route("GET /buildings/tiles z=15", "GET", lambda c, i: (_tile(15), {})),
+    Route("GET /buildings/tiles z=12", "GET", lambda c, i: (_tile(12), {})),
+    Route("GET /reports/buildings/{id}/reports", "GET", lambda c, i: (
+        f"/reports/buildings/{i % c['buildings'] + 1}/reports", {})),
+    Route("GET /reports/buildings/{id}/reports fields", "GET", lambda c, i: (
+        f"/reports/buildings/{i % c['buildings'] + 1}/reports", {"params": {"fields": "id,status,severity"}})),
+    Route("GET /help/", "GET", lambda c, i: ("/help/", {})),
+    Route("GET /help/?building_id", "GET", lambda c, i: ("/help/", {"params": {"building_id": i % c["buildings"] + 1}})),
+    Route("GET /help/{id}/responses", "GET", lambda c, i: (f"/help/{i % c['help'] + 1}/responses", {})),
+    Route("GET /analytics/top-buildings", "GET", lambda c, i: ("/analytics/top-buildings", {})),
+    Route("GET /analytics/top-buildings days bbox", "GET", lambda c, i: (
+        "/analytics/top-buildings", {"params": {"days": 30, **BBOX}})),
+    Route("GET /analytics/severity-stats", "GET", lambda c, i: ("/analytics/severity-stats", {})),
+    Route("GET /analytics/reports-by-day", "GET", lambda c, i: ("/analytics/reports-by-day", {})),
+    Route("GET /analytics/stats category", "GET", lambda c, i: ("/analytics/stats", {"params": {"group_by": "category"}})),
+
+    # --- запись (после чтения: меняют данные и сбрасывают кеши) ---
+    Route("POST /buildings/", "POST", lambda c, i: (
+        "/buildings/", {"json": {"lat": 55.75 + i * 1e-5, "lng": 37.62, "address": f"Бенч, {i}"}}), write=True),
+    Route("PATCH /buildings/{id}/position", "PATCH", lambda c, i: (
+        f"/buildings/{i % c['buildings'] + 1}/position", {"json": {"lat": 55.75 + i * 1e-5}}), write=True),
+    Route("POST /buildings/{id}/confirm-positive", "POST", lambda c, i: (
+        f"/buildings/{i % c['buildings'] + 1}/confirm-positive", {}), write=True),
+    Route("POST /reports/", "POST", _report_form, write=True),
+    Route("POST /reports/{id}/confirm-problem", "POST", lambda c, i: (
+        f"/reports/{i % c['reports'] + 1}/confirm-problem", {}), write=True),
+    Route("POST /reports/{id}/confirm-resolved", "POST", lambda c, i: (
+        f"/reports/{c['reports'] - i % c['reports']}/confirm-resolved", {}), write=True),
+    Route("POST /help/", "POST", lambda c, i: ("/help/", {"json": {
+        "building_id": c["buildings"] - i % c["buildings"],
+        "title": "Бенчмарк",
+        "description": "Нужна помощь с продуктами",
+        "category": "other",
+    }}), write=True),
+    Route("POST /help/{id}/respond", "POST", lambda c, i: (
+        f"/help/{i % c['help'] + 1}/respond", {"headers": {"X-User-Hash": f"bench-{i}"}}), write=True),
+    Route("POST /help/{id}/close", "POST", lambda c, i: (f"/help/{i % c['help'] + 1}/close", {}), write=True),
+]
+
+
+def _client(ip: str = "127.0.0.1"):
+    transport = httpx.ASGITransport(app=app, client=(ip, 40000))
+    return httpx.AsyncClient(transport=transport, base_url="http://bench")
+
+
+def _ip(rnd):
+    return f"10.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}"
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run_route(route: Route, ctx, requests: int, warmup: int, rnd):
+    latencies, queries, statuses = [], [], Counter()
+
+    async with _client() as shared:
+        for i in range(warmup + requests):
+            path, kwargs = route.build(ctx, ctx["offset"] + i)
+
+            if route.write:
+                client = _client(_ip(rnd))
+            else:
+                client = shared
+
+            start = time.perf_counter()
+            r = await client.request(route.method, path, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            if route.write:
+                await client.aclose()
+
+            if i < warmup:
+                continue
+
+            latencies.append(elapsed * 1000)
+            queries.append(int(r.headers.get("x-db-queries", 0)))
+            statuses[r.status_code] += 1
+
+    ctx["offset"] += warmup + requests  # следующий роут пишет уже в другие дома/жалобы
+
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(_pct(latencies, 0.50), 3),
+        "p95_ms": round(_pct(latencies, 0.95), 3),
+        "p99_ms": round(_pct(latencies, 0.99), 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "queries_p50": _pct(queries, 0.50),
+        "queries_max": max(queries),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance: float) -> list:
+    # Регрессия: p95 хуже на tolerance или выросло число SQL-запросов
+    regressions = []
+
+    print(f"\n{'route':<46}{'p95 was':>10}{'p95 now':>10}{'ratio':>8}{'queries':>12}")
+    for name, now in results["routes"].items():
+        was = baseline["routes"].get(name)
+        if was is None:
+            continue
+
+        ratio = now["p95_ms"] / was["p95_ms"] if was["p95_ms"] else float("inf")
+        queries = f"{was['queries_p50']}->{now['queries_p50']}"
+        flag = ""
+        if ratio > 1 + tolerance or now["queries_p50"] > was["queries_p50"]:
+            flag = "  <-- регрессия"
+            regressions.append(name)
+
+        print(f"{name:<46}{was['p95_ms']:>10.1f}{now['p95_ms']:>10.1f}{ratio:>8.2f}{queries:>12}{flag}")
+
+    return regressions
+
+
+async def run(args, ctx):
+    rnd = random.Random(args.seed)
+    routes = [r for r in ROUTES if not args.only or any(s in r.name for s in args.only)]
+    results = {}
+
+    print(f"{'route':<46}{'p50':>8}{'p95':>8}{'p99':>8}{'queries':>9}  statuses")
+    for route in routes:
+        stats = await run_route(route, ctx, args.requests, args.warmup, rnd)
+        results[route.name] = stats
+        print(
+            f"{route.name:<46}{stats['p50_ms']:>8.1f}{stats['p95_ms']:>8.1f}{stats['p99_ms']:>8.1f}"
+            f"{stats['queries_p50']:>9}  {stats['statuses']}"
+        )
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DEFAULT_DB, help="база бенчмарка (DATABASE_URL не используется)")
+    parser.add_argument("--force", action="store_true", help="разрешить засев базы без 'bench' в имени")
+    parser.add_argument("--buildings", type=int, default=20000)
+    parser.add_argument("--reports-per-building", type=float, default=3.0)
+    parser.add_argument("--confirmations-per-report", type=float, default=2.0)
+    parser.add_argument("--help-per-building", type=float, default=0.3)
+    parser.add_argument("--no-seed", action="store_true", help="база уже засеяна (те же --buildings и доли)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="подстроки имён роутов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="bench_routes.json")
+    parser.add_argument("--compare", help="JSON прошлого прогона")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост p95 (0.2 = +20%%)")
+    args = parser.parse_args()
+
+    db_url = args.db  # приложение уже смотрит сюда же (см. _db_arg)
+    scale = {
+        "buildings": args.buildings,
+        "reports": int(args.buildings * args.reports_per_building),
+        "help": int(args.buildings * args.help_per_building),
+    }
+
+    if not args.no_seed:
+        print("seed:", seed_city(
+            create_engine(db_url),
+            args.buildings,
+            args.reports_per_building,
+            args.confirmations_per_report,
+            args.help_per_building,
+            seed=args.seed,
+            force=args.force,
+        ))
+
+    ctx = {**scale, "offset": 0}
+    routes = asyncio.run(run(args, ctx))
+
+    results = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "dialect": create_engine(db_url).dialect.name,
+            "python": platform.python_version(),
+            "scale": scale,
+            "requests": args.requests,
+            "warmup": args.warmup,
+        },
+        "routes": routes,
+    }
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nрезультаты: {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
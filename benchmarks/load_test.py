@@ -0,0 +1,82 @@
+"""Нагрузочный тест горячих GET-роутов против запущенного сервера.
+
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 200 --duration 20
+
+Запустить на коммите до и после перехода на async — сравнить req/s.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+# Окно ~5x5 км в центре синтетического города (benchmarks/seed.py)
+BBOX = {"south": 55.73, "west": 37.59, "north": 55.77, "east": 37.65}
+
+
+PATHS = [
+    ("/buildings/", BBOX),
+    ("/reports/buildings/{id}/reports", None),
+    ("/help/", {"building_id": "{id}"}),
+]
+
+
+async def worker(client, paths, buildings, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        path, params = random.choice(paths)
+        building_id = str(random.randint(1, buildings))
+
+        url = path.replace("{id}", building_id)
+        if params:
+            params = {k: str(v).replace("{id}", building_id) for k, v in params.items()}
+
+        start = time.perf_counter()
+        try:
+            r = await client.get(url, params=params)
+            if r.status_code >= 400:
+                errors.append(r.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args):
+    paths = PATHS
+    latencies, errors = [], []
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+
+        await asyncio.gather(*[
+            worker(client, paths, args.buildings, deadline, latencies, errors)
+            for _ in range(args.concurrency)
+        ])
+
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    q = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"requests:    {len(latencies)} ok, {len(errors)} errors")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"latency ms:  p50={q(0.50):.1f} p95={q(0.95):.1f} p99={q(0.99):.1f} mean={statistics.mean(latencies) * 1000:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--buildings", type=int, default=20000, help="сколько домов в seed")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Синтетический город для бенчмарков.
+
+    python -m benchmarks.seed --db sqlite:///bench.db --buildings 20000
+
+Засев начинается с drop_all, поэтому база берётся только из --db (не из
+DATABASE_URL) и должна иметь "bench" в имени — иначе нужен --force.
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench.db")
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from app import building_status, crud, models, rollups
+from app.database import Base
+from app.geo import quadkey_for
+
+# Центр и размах "города" (примерно Москва в пределах МКАД)
+CITY_CENTER = (55.75, 37.62)
+CITY_SPAN = (0.25, 0.40)
+
+CATEGORIES = ["yard", "road", "trashinyard", "noise", "JKH", "water", "heating", "parking", "other"]
+SEVERITIES = ["low", "medium", "high"]
+PERIODICITIES = ["rare", "often", "always"]
+
+BATCH = 5000
+
+
+def check_scratch_db(engine, force: bool = False):
+    # Защита от drop_all по базе приложения: DATABASE_URL в окружении может быть боевым
+    name = os.path.basename(engine.url.database or "")
+    if "bench" not in name and not force:
+        raise SystemExit(
+            f"{engine.url!r}: в имени базы нет 'bench' — засев удалит все таблицы. "
+            "Укажите --force, если эту базу действительно можно стереть."
+        )
+
+
+def _batched(engine, model, rows):
+    with engine.begin() as conn:
+        for i in range(0, len(rows), BATCH):
+            conn.execute(insert(model), rows[i:i + BATCH])
+
+
+def seed_city(
+    engine,
+    buildings: int = 20000,
+    reports_per_building: float = 3.0,
+    confirmations_per_report: float = 2.0,
+    help_per_building: float = 0.3,
+    seed: int = 42,
+    force: bool = False,
+):
+    check_scratch_db(engine, force)
+
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    lat0, lng0 = CITY_CENTER
+    dlat, dlng = CITY_SPAN
+
+    rows = []
+    for i in range(1, buildings + 1):
+        lat = lat0 + rnd.uniform(-dlat / 2, dlat / 2)
+        lng = lng0 + rnd.uniform(-dlng / 2, dlng / 2)
+        rows.append({
+            "id": i,
+            "lat": lat,
+            "lng": lng,
+            "address": f"ул. Синтетическая, {i}",
+            "created_at": now,
+            "positive_count": 0,
+            "quadkey": quadkey_for(lat, lng),
+        })
+    _batched(engine, models.Building, rows)
+
+    reports = []
+    for i in range(int(buildings * reports_per_building)):
+        reports.append({
+            "id": i + 1,
+            "building_id": rnd.randint(1, buildings),
+            "category": rnd.choice(CATEGORIES),
+            "text": "Синтетическая жалоба",
+            "severity": rnd.choice(SEVERITIES),
+            "periodicity": rnd.choice(PERIODICITIES),
+            "user_hash": f"user-{rnd.randint(1, buildings * 2)}",
+            "created_at": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 60)),
+            "status": "open",
+        })
+    _batched(engine, models.Report, reports)
+
+    confirmations = []
+    seen = set()  # уникальный индекс (report_id, user_hash, type)
+    for i in range(int(len(reports) * confirmations_per_report)):
+        r = reports[rnd.randrange(len(reports))]
+        row = {
+            "report_id": r["id"],
+            "user_hash": f"user-{rnd.randint(1, buildings * 2)}",
+            "type": "problem" if rnd.random() < 0.8 else "resolved",
+            "created_at": r["created_at"] + timedelta(minutes=rnd.randint(1, 60 * 24 * 10)),
+        }
+        key = (row["report_id"], row["user_hash"], row["type"])
+        if key not in seen:
+            seen.add(key)
+            confirmations.append(row)
+    _batched(engine, models.ReportConfirmation, confirmations)
+
+    _batched(engine, models.NeighborHelp, [
+        {
+            "building_id": rnd.randint(1, buildings),
+            "title": "Нужна помощь",
+            "category": "other",
+            "description": "Синтетическая заявка",
+            "status": "open" if rnd.random() < 0.7 else "closed",
+            "user_hash": f"user-{rnd.randint(1, buildings * 2)}",
+            "created_at": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30)),
+        }
+        for _ in range(int(buildings * help_per_building))
+    ])
+
+    # id проставлены явно — в Postgres сдвигаем последовательности, иначе POST упрётся в дубль
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for table in ("buildings", "reports"):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+                ))
+
+    # Проекции и счётчики — как после rebuild-* в app.cli
+    with Session(engine) as db:
+        building_status.rebuild(db)
+        rollups.rebuild(db)
+        crud.backfill_report_counts(db)
+        crud.backfill_confirmation_counts(db)
+
+    return {
+        "buildings": buildings,
+        "reports": len(reports),
+        "confirmations": len(confirmations),
+        "help": int(buildings * help_per_building),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="sqlite:///bench.db")
+    parser.add_argument("--buildings", type=int, default=20000)
+    parser.add_argument("--reports-per-building", type=float, default=3.0)
+    parser.add_argument("--force", action="store_true", help="разрешить засев базы без 'bench' в имени")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db)
+    print(seed_city(engine, args.buildings, args.reports_per_building, force=args.force))
+
+
+if __name__ == "__main__":
+    main()